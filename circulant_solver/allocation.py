@@ -0,0 +1,101 @@
+import numpy as np
+from typing import List, Optional, Tuple
+from circulant_solver.circulant import Circulant
+from circulant_solver.inner_product import InnerProduct
+from circulant_solver.calculation import calculate_W_r, calculate_W_r_toeplitz, calculate_loss_gradient
+from circulant_solver.optimization import solve_combination_parameters
+
+__all__ = [
+    "get_loss_sensitivity",
+    "allocate_shots"
+]
+
+
+def get_loss_sensitivity(C: Circulant, ip: InnerProduct, threshold: int, alpha: List) -> np.ndarray:
+    r"""Get the sensitivity of the loss to the estimation of each Hadamard test circuit.
+
+    Args:
+        C (Circulant): circulant matrix class
+        ip (InnerProduct): a list of inner products
+        threshold (int): truncation threshold of our algorithm
+        alpha (List): the optimal combination parameters
+
+    Returns:
+        np.ndarray: the derivatives of shape (4, power), with the rows ordered as in ``ip.get_shot_counts``
+    """
+    grad_R, grad_I = calculate_loss_gradient(C, list(range(-threshold, threshold + 1)), ip, alpha)
+    pos = ip.power + np.arange(1, ip.power + 1)
+    neg = ip.power - np.arange(1, ip.power + 1)
+    grad = np.stack([grad_R[pos], grad_I[pos], grad_R[neg], grad_I[neg]])
+    if ip.symmetry != "none":
+        # The negative powers are the conjugates of the estimations of the positive ones
+        grad = np.stack([grad[0] + grad[2], grad[1] - grad[3], np.zeros(ip.power), np.zeros(ip.power)])
+    return grad
+
+
+def allocate_shots(C: Circulant, ip: InnerProduct, threshold: int, budget: int, rounds: int = 4,
+                   target: Optional[float] = None, granularity: int = 1,
+                   solver: str = "direct") -> Tuple[float, List, float]:
+    r"""Spend a budget of measurements on the Hadamard tests that contribute most to the variance of the loss.
+
+    The recorded estimations of ``ip`` serve as the pilot round. In each round, the loss is linearized in the
+    estimations by ``calculate_loss_gradient``, so that its variance is :math:`\sum_e g_e^2 \sigma_e^2 / n_e`,
+    where :math:`\sigma_e^2 = 1 - \mu_e^2` is the variance of one measurement of the Hadamard test of the circuit e
+    and :math:`n_e` its number of measurements. At a fixed total number of measurements, this variance is minimal
+    for :math:`n_e \propto |g_e| \sigma_e`, and the share of the budget of the round is added towards these numbers
+    with ``ip.refine``. Circuits that do not appear in W and r receive no measurements.
+
+    Args:
+        C (Circulant): circulant matrix class
+        ip (InnerProduct): a list of inner products, estimated by the Hadamard tests
+        threshold (int): truncation threshold of our algorithm
+        budget (int): the total number of measurements added to the pilot round
+        rounds (int, optional): number of rounds the budget is split into
+        target (float, optional): stop as soon as the standard deviation of the loss is estimated below the target
+        granularity (int, optional): the numbers of measurements added to a circuit are multiples of it
+        solver (str, optional): name of the solver, see ``solve_combination_parameters``
+
+    Returns:
+        Tuple[float, List, float]: loss, the optimal combination parameters and the estimated standard deviation
+        of the loss
+    """
+    Ansatz_pows = list(range(-threshold, threshold + 1))
+    spent = 0
+    for step in range(rounds + 1):
+        if solver == "toeplitz":
+            W, r = calculate_W_r_toeplitz(C, Ansatz_pows, ip)
+        else:
+            W, r = calculate_W_r(C, Ansatz_pows, ip)
+        loss, alpha = solve_combination_parameters(W, r, solver)
+        counts = ip.get_shot_counts()
+        estimations = np.stack([getattr(ip, name) for name in InnerProduct._RECORDS[:4]])
+        weights = np.abs(get_loss_sensitivity(C, ip, threshold, alpha)) * np.sqrt(np.clip(1 - estimations ** 2, 0, 1))
+        used = weights > 0
+        std = np.sqrt(np.sum(weights[used] ** 2 / counts[used]))
+        if step == rounds or spent >= budget or not np.any(used) or (target is not None and std <= target):
+            break
+        share = (budget - spent) // (rounds - step)
+        # Neyman allocation of the measurements of the circuits used so far and of this round
+        extra = np.maximum(weights / weights.sum() * (counts[used].sum() + share) - counts, 0)
+        extra = np.floor(extra * share / extra.sum() / granularity).astype(np.int64) * granularity
+        if not np.any(extra):
+            break
+        ip.refine(extra)
+        spent += int(extra.sum())
+    return loss, alpha, std
+
+
+# Test
+if __name__ == "__main__":
+    vec_b = np.random.rand(2 ** 6) + 1j * np.random.rand(2 ** 6)
+    vec_b /= np.linalg.norm(vec_b)
+    C = Circulant(3, [0, 1, -1], [2, -0.5, -0.5])
+    exact = solve_combination_parameters(*calculate_W_r(C, list(range(-3, 4)), InnerProduct("fft", vec_b, 1, 3)))[0]
+    # The same total number of measurements, spent uniformly or adaptively after a pilot round
+    circuits = 4 * InnerProduct("fft", vec_b, 1, 3).power
+    for pilot, budget in [(4096, 0), (1024, 3072 * circuits)]:
+        errors = []
+        for seed in range(50):
+            ip = InnerProduct("emulated-shots", vec_b, 1, 3, pilot, rng=seed)
+            errors.append(allocate_shots(C, ip, 3, budget)[0] - exact)
+        print(pilot, budget, np.sqrt(np.mean(np.square(errors))))
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import tempfile
+import threading
+import numpy as np
+from typing import Dict, Optional
+
+__all__ = [
+    "InnerProductCache"
+]
+
+
+class InnerProductCache:
+    r"""Set the on-disk cache of inner product tables.
+
+    The inner products :math:`\langle b | Q^{p} | b \rangle` only depend on b, the access and the number of shots,
+    not on the circulant matrix. The cache stores the recorded arrays of an InnerProduct as one uncompressed
+    ``.npz`` file per key, so that they can be reused by other circulant matrices and other experiments.
+    A table is reused as a prefix when a larger threshold is requested later, and only the new powers are calculated.
+    The least recently used tables are evicted once the total size exceeds the bound.
+
+    Attributes:
+        directory (str): the directory of the cache
+        max_bytes (int): the bound of the total size of the cached tables in bytes
+    """
+
+    def __init__(self, directory: str = os.path.join("~", ".cache", "circulant_solver"), max_bytes: int = 2 ** 30):
+        r"""Set the on-disk cache of inner product tables.
+
+        Args:
+            directory (str, optional): the directory of the cache, created if it does not exist
+            max_bytes (int, optional): the bound of the total size of the cached tables in bytes
+        """
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        self.__lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def get_key(b_hash: str, access: str, shots: int, symmetry: str, options: Optional[Dict] = None) -> str:
+        r"""Get the key of an inner product table.
+
+        Args:
+            b_hash (str): the hash of b, see ``get_b_hash``
+            access (str): the access to the backend
+            shots (int): number of measurements, ignored by the exact accesses
+            symmetry (str): the symmetry option of the InnerProduct
+            options (Dict, optional): the other options that change the estimations, e.g. the readout error;
+                                      options that are None are left out, so that they do not change the key
+
+        Returns:
+            str: the key of the table
+        """
+        fields = [b_hash, access, str(shots), symmetry]
+        if options is not None:
+            fields += [f"{name}={value}" for name, value in sorted(options.items()) if value is not None]
+        return hashlib.sha256("|".join(fields).encode()).hexdigest()
+
+    def load(self, key: str) -> Optional[Dict[str, np.ndarray]]:
+        r"""Load an inner product table and mark it as recently used.
+
+        Args:
+            key (str): the key of the table
+
+        Returns:
+            Optional[Dict[str, np.ndarray]]: the recorded arrays of the table; None if it is not cached
+        """
+        path = self.__get_path(key)
+        with self.__lock:
+            try:
+                with np.load(path) as data:
+                    records = {name: data[name] for name in data.files}
+            except (OSError, ValueError, KeyError):
+                return None
+            os.utime(path)
+        return records
+
+    def store(self, key: str, records: Dict[str, np.ndarray]):
+        r"""Store an inner product table, and evict the least recently used tables if the cache is too large.
+
+        Args:
+            key (str): the key of the table
+            records (Dict[str, np.ndarray]): the recorded arrays of the table
+        """
+        path = self.__get_path(key)
+        with self.__lock:
+            handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(handle, "wb") as file:
+                np.savez(file, **records)
+            os.replace(temp_path, path)
+            self.__evict(keep=path)
+
+    def clear(self):
+        r"""Remove all the cached tables."""
+        with self.__lock:
+            for name in os.listdir(self.directory):
+                if name.endswith(".npz"):
+                    os.remove(os.path.join(self.directory, name))
+
+    def __get_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def __evict(self, keep: str):
+        r"""Remove the least recently used tables until the total size is within the bound.
+
+        Args:
+            keep (str): the path of the table just stored, which is never removed
+        """
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npz"):
+                stat = os.stat(os.path.join(self.directory, name))
+                files.append((stat.st_mtime, stat.st_size, os.path.join(self.directory, name)))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if path != keep:
+                os.remove(path)
+                total -= size
+
+
+# Test
+if __name__ == "__main__":
+    from datetime import datetime
+    from circulant_solver.inner_product import InnerProduct
+    cache = InnerProductCache(tempfile.mkdtemp())
+    vec_b = np.random.rand(2 ** 12)
+    vec_b /= np.linalg.norm(vec_b)
+    start = datetime.now()
+    ip = InnerProduct("true", vec_b, 1, 200, cache=cache)
+    print("first:", datetime.now() - start)
+    start = datetime.now()
+    # The first 200 thresholds are read from the cache, and only the new powers are calculated
+    cached = InnerProduct("true", vec_b, 1, 220, cache=cache)
+    print("prefix reuse:", datetime.now() - start,
+          np.array_equal(cached.pos_inner_product_real[:ip.power], ip.pos_inner_product_real))
@@ -2,16 +2,36 @@ import numpy as np
 from typing import Tuple
 from circulant_solver.inner_product import InnerProduct
 from circulant_solver.circulant import Circulant
-from typing import List
+from circulant_solver.toeplitz import Toeplitz
+from typing import List, Union, Iterator
 
 __all__ = [
-    "calculate_W_r"
+    "calculate_W_r",
+    "calculate_W_r_toeplitz",
+    "calculate_W_r_batch",
+    "calculate_loss_gradient",
+    "slice_W_r",
+    "sweep_W_r"
 ]
 
 
+def _check_power_range(ip: InnerProduct, max_pow: int):
+    r"""Check that the inner products up to the given power are recorded in ``ip``.
+
+    Args:
+        ip (InnerProduct): a list of inner products
+        max_pow (int): the largest absolute power required
+    """
+    if max_pow > ip.power:
+        raise IndexError(f"inner products up to power {max_pow} are required, but only {ip.power} are available")
+
+
 def calculate_W_r(C: Circulant, Ansatz_pows: List, ip: InnerProduct) -> Tuple[np.ndarray, np.ndarray]:
     r"""Calculate the auxiliary system W and r defined in our paper.
 
+    All inner products are gathered from the lookup table of ``ip`` by broadcast index arithmetic,
+    so that the assembly costs one vectorized pass over the entries of W and r per pair of decomposition terms.
+
     Args:
         C (Circulant): circulant matrix class
         Ansatz_pows (list): a list of integers representing different powers of the permutations
@@ -20,26 +40,238 @@ def calculate_W_r(C: Circulant, Ansatz_pows: List, ip: InnerProduct) -> Tuple[np
     Returns:
         Tuple[np.ndarray, np.ndarray]: matrix W and vector r
     """
-    C_coeffs = C.get_coeffs()
-    C_pows = C.get_pows()
+    C_coeffs = np.asarray(C.get_coeffs())
+    C_pows = np.asarray(C.get_pows(), dtype=np.int64)
     K = len(C_coeffs)
-    T = len(Ansatz_pows)
+    pows = np.asarray(Ansatz_pows, dtype=np.int64)
+    T = len(pows)
+    table = ip.get_inner_product_table()
+    table_R = table.real
+    table_I = table.imag
+    _check_power_range(ip, 2 * (np.max(np.abs(pows), initial=0) + np.max(np.abs(C_pows), initial=0)))
+    # Index of the power 0 in the lookup table
+    center = ip.power
+
+    # Broadcast index arithmetic: q_pow = - Ansatz_pows[t_1] - C_pows[k_1] + C_pows[k_2] + Ansatz_pows[t_2]
+    ansatz_diff = pows[np.newaxis, :] - pows[:, np.newaxis] + center
+    coeff_prod = np.conj(C_coeffs)[:, np.newaxis] * C_coeffs[np.newaxis, :]
     V_R = np.zeros((T, T), dtype=np.float64)
     V_I = np.zeros((T, T), dtype=np.float64)
     q_R = np.zeros((T, 1), dtype=np.float64)
     q_I = np.zeros((T, 1), dtype=np.float64)
-    for t_1 in range(T):
-        for t_2 in range(T):
-            for k_1 in range(K):
-                for k_2 in range(K):
-                    q_pow = - Ansatz_pows[t_1] - C_pows[k_1] + C_pows[k_2] + Ansatz_pows[t_2]
-                    V_R[t_1][t_2] += np.conj(C_coeffs[k_1]) * C_coeffs[k_2] * ip.get_inner_product(q_pow, imag=False)
-                    V_I[t_1][t_2] += np.conj(C_coeffs[k_1]) * C_coeffs[k_2] * ip.get_inner_product(q_pow, imag=True)
-    for t in range(T):
-        for k in range(K):
-            q_pow = Ansatz_pows[t] + C_pows[k]
-            q_R[t] += C_coeffs[k] * ip.get_inner_product(q_pow, imag=False)
-            q_I[t] += C_coeffs[k] * ip.get_inner_product(q_pow, imag=True)
-    W = np.array(np.append(np.append(V_R, -V_I, axis=1), np.append(V_I, V_R, axis=1), axis=0), dtype='float64')
-    r = np.array(np.append(q_R, q_I, axis=0), dtype='float64')
+    # Accumulate the K x K terms in the same order as the scalar summation, so that the results coincide exactly
+    for k_1 in range(K):
+        for k_2 in range(K):
+            idx = ansatz_diff + (C_pows[k_2] - C_pows[k_1])
+            V_R += np.real(coeff_prod[k_1, k_2] * table_R[idx])
+            V_I += np.real(coeff_prod[k_1, k_2] * table_I[idx])
+    # q_t = <C Q^t b|b> is the conjugate of sum_k c_k <b|Q^{t + P_k}|b>
+    for k in range(K):
+        idx = pows[:, np.newaxis] + C_pows[k] + center
+        q_R += np.real(C_coeffs[k] * table_R[idx])
+        q_I -= np.real(C_coeffs[k] * table_I[idx])
+    W = np.block([[V_R, -V_I], [V_I, V_R]])
+    r = np.concatenate((q_R, q_I), axis=0)
+    return W, r
+
+
+def calculate_W_r_toeplitz(C: Circulant, Ansatz_pows: List, ip: InnerProduct) -> Tuple[Toeplitz, np.ndarray]:
+    r"""Calculate the auxiliary system W and r defined in our paper in the structured Toeplitz form.
+
+    Since C is circulant and the Ansatz consists of consecutive powers of the permutation,
+    the block V of W only depends on the difference of the powers. Only the 2T - 1 entries of the generating
+    sequence are calculated, so that the memory is linear in T.
+
+    Args:
+        C (Circulant): circulant matrix class
+        Ansatz_pows (list): a list of consecutive integers representing different powers of the permutations
+        ip: (InnerProduct): a list of inner products
+
+    Returns:
+        Tuple[Toeplitz, np.ndarray]: structured matrix W and vector r
+    """
+    C_coeffs = np.asarray(C.get_coeffs())
+    C_pows = np.asarray(C.get_pows(), dtype=np.int64)
+    K = len(C_coeffs)
+    pows = np.asarray(Ansatz_pows, dtype=np.int64)
+    T = len(pows)
+    if T == 0 or np.any(np.diff(pows) != 1):
+        raise ValueError("the Toeplitz structure requires an Ansatz of consecutive powers")
+    _check_power_range(ip, 2 * (np.max(np.abs(pows)) + np.max(np.abs(C_pows), initial=0)))
+    table = ip.get_inner_product_table()
+    table_R = table.real
+    table_I = table.imag
+    center = ip.power
+
+    # The generating sequence v_d with lags d = t_2 - t_1 from -(T-1) to T-1
+    lags = np.arange(-(T - 1), T) + center
+    coeff_prod = np.conj(C_coeffs)[:, np.newaxis] * C_coeffs[np.newaxis, :]
+    v_R = np.zeros(2 * T - 1, dtype=np.float64)
+    v_I = np.zeros(2 * T - 1, dtype=np.float64)
+    for k_1 in range(K):
+        for k_2 in range(K):
+            idx = lags + (C_pows[k_2] - C_pows[k_1])
+            v_R += np.real(coeff_prod[k_1, k_2] * table_R[idx])
+            v_I += np.real(coeff_prod[k_1, k_2] * table_I[idx])
+    q_R = np.zeros((T, 1), dtype=np.float64)
+    q_I = np.zeros((T, 1), dtype=np.float64)
+    for k in range(K):
+        idx = pows[:, np.newaxis] + C_pows[k] + center
+        q_R += np.real(C_coeffs[k] * table_R[idx])
+        q_I -= np.real(C_coeffs[k] * table_I[idx])
+    W = Toeplitz(v_R + 1j * v_I)
+    r = np.concatenate((q_R, q_I), axis=0)
+    return W, r
+
+
+def calculate_W_r_batch(C_pows: List[int], C_coeffs: np.ndarray, Ansatz_pows: List,
+                        ip: InnerProduct) -> Tuple[np.ndarray, np.ndarray]:
+    r"""Calculate the auxiliary systems W and r of a batch of circulant matrices with the same powers.
+
+    The terms of all matrices with the same power difference :math:`P_{k_2} - P_{k_1}` share the same gathered
+    block of inner products, so the systems of all matrices are assembled by one tensor contraction of the
+    combined coefficients with these blocks.
+
+    Args:
+        C_pows (List[int]): the powers of the permutations shared by all matrices
+        C_coeffs (np.ndarray): the coefficients of the matrices, one row per matrix
+        Ansatz_pows (list): a list of integers representing different powers of the permutations
+        ip: (InnerProduct): a list of inner products
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: the stacked matrices W and vectors r, with the matrices along the first axis
+    """
+    C_coeffs = np.atleast_2d(np.asarray(C_coeffs))
+    C_pows = np.asarray(C_pows, dtype=np.int64)
+    pows = np.asarray(Ansatz_pows, dtype=np.int64)
+    table = ip.get_inner_product_table()
+    _check_power_range(ip, 2 * (np.max(np.abs(pows), initial=0) + np.max(np.abs(C_pows), initial=0)))
+    center = ip.power
+
+    # Combine the coefficient products of the pairs of terms with the same power difference
+    diffs, inverse = np.unique(C_pows[np.newaxis, :] - C_pows[:, np.newaxis], return_inverse=True)
+    coeff_prod = np.conj(C_coeffs)[:, :, np.newaxis] * C_coeffs[:, np.newaxis, :]
+    combined = np.zeros((C_coeffs.shape[0], diffs.size), dtype=np.float64)
+    np.add.at(combined.T, inverse.reshape(-1), np.real(coeff_prod.reshape(C_coeffs.shape[0], -1)).T)
+    ansatz_diff = pows[np.newaxis, :] - pows[:, np.newaxis] + center
+    blocks = table[ansatz_diff[np.newaxis, :, :] + diffs[:, np.newaxis, np.newaxis]]
+    V_R = np.tensordot(combined, blocks.real, axes=1)
+    V_I = np.tensordot(combined, blocks.imag, axes=1)
+    vectors = table[pows[np.newaxis, :] + C_pows[:, np.newaxis] + center]
+    q_R = np.real(C_coeffs) @ vectors.real
+    q_I = -np.real(C_coeffs) @ vectors.imag
+    W = np.concatenate((np.concatenate((V_R, -V_I), axis=2), np.concatenate((V_I, V_R), axis=2)), axis=1)
+    r = np.concatenate((q_R, q_I), axis=1)[:, :, np.newaxis]
     return W, r
+
+
+def calculate_loss_gradient(C: Circulant, Ansatz_pows: List, ip: InnerProduct,
+                            alpha: List) -> Tuple[np.ndarray, np.ndarray]:
+    r"""Calculate the gradient of the optimal objective with respect to the inner products.
+
+    Since the combination parameters minimize :math:`x^T W x - 2 r^T x + 1`, the derivative of its optimal value,
+    whose absolute value is the loss, with respect to an inner product is the one of the objective at the fixed
+    optimal parameters, which only involves the entries of W and r containing this inner product. The contributions
+    of all entries with the same power are accumulated on the lookup table of ``ip``.
+
+    Args:
+        C (Circulant): circulant matrix class
+        Ansatz_pows (list): a list of integers representing different powers of the permutations
+        ip: (InnerProduct): a list of inner products
+        alpha (List): the optimal combination parameters of the Ansatz powers
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: the derivatives with respect to the real and the imaginary parts of the
+        entries of ``ip.get_inner_product_table()``; zero for the power 0, which is not estimated
+    """
+    C_coeffs = np.asarray(C.get_coeffs())
+    C_pows = np.asarray(C.get_pows(), dtype=np.int64)
+    pows = np.asarray(Ansatz_pows, dtype=np.int64)
+    alpha = np.asarray(alpha, dtype=np.complex128).reshape(-1)
+    _check_power_range(ip, 2 * (np.max(np.abs(pows), initial=0) + np.max(np.abs(C_pows), initial=0)))
+    center = ip.power
+    grad_R = np.zeros(2 * ip.power + 1, dtype=np.float64)
+    grad_I = np.zeros(2 * ip.power + 1, dtype=np.float64)
+
+    # Derivatives of x^T W x: the products of the parameters are summed by the difference of the Ansatz powers,
+    # and the coefficient products by the difference of the powers of C
+    ansatz_diffs, ansatz_inverse = np.unique(pows[np.newaxis, :] - pows[:, np.newaxis], return_inverse=True)
+    outer_R = np.outer(alpha.real, alpha.real) + np.outer(alpha.imag, alpha.imag)
+    outer_I = np.outer(alpha.imag, alpha.real) - np.outer(alpha.real, alpha.imag)
+    sum_R = np.bincount(ansatz_inverse.reshape(-1), outer_R.reshape(-1), minlength=ansatz_diffs.size)
+    sum_I = np.bincount(ansatz_inverse.reshape(-1), outer_I.reshape(-1), minlength=ansatz_diffs.size)
+    diffs, inverse = np.unique(C_pows[np.newaxis, :] - C_pows[:, np.newaxis], return_inverse=True)
+    combined = np.zeros(diffs.size, dtype=np.float64)
+    np.add.at(combined, inverse.reshape(-1), np.real(np.conj(C_coeffs)[:, np.newaxis] * C_coeffs).reshape(-1))
+    idx = (diffs[:, np.newaxis] + ansatz_diffs[np.newaxis, :] + center).reshape(-1)
+    np.add.at(grad_R, idx, np.outer(combined, sum_R).reshape(-1))
+    np.add.at(grad_I, idx, np.outer(combined, sum_I).reshape(-1))
+    # Derivatives of - 2 r^T x
+    idx = (pows[np.newaxis, :] + C_pows[:, np.newaxis] + center).reshape(-1)
+    np.add.at(grad_R, idx, -2 * np.outer(np.real(C_coeffs), alpha.real).reshape(-1))
+    np.add.at(grad_I, idx, 2 * np.outer(np.real(C_coeffs), alpha.imag).reshape(-1))
+    grad_R[center] = 0
+    grad_I[center] = 0
+    return grad_R, grad_I
+
+
+def slice_W_r(W: Union[np.ndarray, Toeplitz], r: np.ndarray, T: int, t: int) -> Tuple[Union[np.ndarray, Toeplitz],
+                                                                                      np.ndarray]:
+    r"""Derive the auxiliary system of a smaller threshold from the one of a larger threshold.
+
+    The Ansatz of threshold t, i.e. the powers from -t to t, is the centered subset of the Ansatz of threshold T.
+    Hence W_t and r_t are principal sub-blocks of W_T and r_T, and no inner product needs to be gathered again.
+    The Toeplitz form is sliced as a view of the generating sequence; the dense real embedding stacks the real
+    and imaginary blocks, so its sub-block is gathered by indexing. Stacked systems, as returned by
+    ``calculate_W_r_batch``, are sliced along the last axes.
+
+    Args:
+        W (Union[np.ndarray, Toeplitz]): the auxiliary matrix W of threshold T
+        r (np.ndarray): the auxiliary vector r of threshold T
+        T (int): the larger truncation threshold
+        t (int): the smaller truncation threshold
+
+    Returns:
+        Tuple[Union[np.ndarray, Toeplitz], np.ndarray]: matrix W and vector r of threshold t
+    """
+    if t > T or t < 0:
+        raise ValueError(f"threshold {t} is not contained in threshold {T}")
+    size = 2 * T + 1
+    idx = np.arange(T - t, T + t + 1)
+    idx = np.concatenate((idx, idx + size))
+    if isinstance(W, Toeplitz):
+        sequence = W.get_sequence()
+        W_t = Toeplitz(sequence[size - 1 - 2 * t:size + 2 * t])
+    else:
+        W_t = W[..., idx[:, np.newaxis], idx]
+    return W_t, r[..., idx, :]
+
+
+def sweep_W_r(C: Circulant, thresholds: List[int], ip: InnerProduct,
+              toeplitz: bool = False) -> Iterator[Tuple[int, Union[np.ndarray, Toeplitz], np.ndarray]]:
+    r"""Calculate the auxiliary systems W and r for a list of thresholds.
+
+    The system of the largest threshold is assembled once, and the systems of the other thresholds are derived
+    from it by ``slice_W_r``.
+
+    Args:
+        C (Circulant): circulant matrix class
+        thresholds (List[int]): a list of truncation thresholds
+        ip: (InnerProduct): a list of inner products
+        toeplitz (bool, optional): whether to use the structured Toeplitz form of W
+
+    Returns:
+        Iterator[Tuple[int, Union[np.ndarray, Toeplitz], np.ndarray]]: threshold, matrix W and vector r
+        for each threshold in the given order
+    """
+    if len(thresholds) == 0:
+        return
+    max_T = int(np.max(thresholds))
+    Ansatz_pows = list(range(-max_T, max_T + 1))
+    if toeplitz:
+        W, r = calculate_W_r_toeplitz(C, Ansatz_pows, ip)
+    else:
+        W, r = calculate_W_r(C, Ansatz_pows, ip)
+    for t in thresholds:
+        W_t, r_t = slice_W_r(W, r, max_T, t)
+        yield t, W_t, r_t
@@ -1,6 +1,7 @@
 import numpy as np
 from typing import List
-from circulant_solver.util import get_permutation_matrix
+from scipy.linalg import circulant
+from scipy.sparse.linalg import LinearOperator
 
 __all__ = [
     "Circulant"
@@ -20,6 +21,10 @@ class Circulant:
 
             C = \sum_{m=0}^{N-1} c_m Q^m,
 
+    Since :math:`Q^p x` is the cyclic shift of x by p, C is diagonalized by the discrete Fourier transform, and its
+    eigenvalues are the Fourier transform of its first column. All operations on vectors of dimension N therefore
+    cost O(N log N) and never form the N x N matrix, which is only built on request by ``get_matrix``.
+
     Attributes:
         term_number (int): number of decomposition terms
         permu_pows (List): a list of integers representing different powers of the permutations
@@ -58,16 +63,108 @@ class Circulant:
         """
         return self.__coeffs
 
+    def get_column(self, dim: int) -> np.ndarray:
+        r"""Get the first column of the circulant matrix.
+
+        Args:
+            dim (int): dimension
+
+        Returns:
+            np.ndarray: the first column, which determines the circulant matrix
+        """
+        column = np.zeros(dim, dtype=np.complex128)
+        np.add.at(column, np.mod(self.__pows[:self.__term_number], dim), self.__coeffs[:self.__term_number])
+        return column
+
+    def eigenvalues(self, dim: int) -> np.ndarray:
+        r"""Get the eigenvalues of the circulant matrix, i.e. the Fourier transform of its first column.
+
+        The eigenvector of the k-th eigenvalue is the k-th Fourier mode :math:`(e^{-2 \pi i jk / N})_j`.
+
+        Args:
+            dim (int): dimension
+
+        Returns:
+            np.ndarray: the eigenvalues
+        """
+        return np.fft.fft(self.get_column(dim))
+
+    def condition_number(self, dim: int) -> float:
+        r"""Get the condition number of the circulant matrix.
+
+        The circulant matrix is normal, so its singular values are the absolute values of its eigenvalues.
+
+        Args:
+            dim (int): dimension
+
+        Returns:
+            float: the ratio of the largest to the smallest singular value; infinity if the matrix is singular
+        """
+        singular_values = np.abs(self.eigenvalues(dim))
+        if np.min(singular_values) == 0:
+            return np.inf
+        return float(np.max(singular_values) / np.min(singular_values))
+
+    def matvec(self, x: np.ndarray) -> np.ndarray:
+        r"""Multiply the circulant matrix with vectors.
+
+        Args:
+            x (np.ndarray): a vector, or the vectors as columns of a matrix
+
+        Returns:
+            np.ndarray: the product Cx
+        """
+        eig = self.eigenvalues(x.shape[0]).reshape((-1,) + (1,) * (x.ndim - 1))
+        return np.fft.ifft(eig * np.fft.fft(x, axis=0), axis=0)
+
+    def rmatvec(self, x: np.ndarray) -> np.ndarray:
+        r"""Multiply the conjugate transpose of the circulant matrix with vectors.
+
+        Args:
+            x (np.ndarray): a vector, or the vectors as columns of a matrix
+
+        Returns:
+            np.ndarray: the product :math:`C^\dagger x`
+        """
+        eig = self.eigenvalues(x.shape[0]).reshape((-1,) + (1,) * (x.ndim - 1))
+        return np.fft.ifft(np.conj(eig) * np.fft.fft(x, axis=0), axis=0)
+
+    def solve(self, b: np.ndarray) -> np.ndarray:
+        r"""Solve the linear system :math:`Cx = b` exactly by dividing by the eigenvalues in the Fourier basis.
+
+        Args:
+            b (np.ndarray): a vector, or the vectors as columns of a matrix
+
+        Returns:
+            np.ndarray: the solution x
+        """
+        eig = self.eigenvalues(b.shape[0]).reshape((-1,) + (1,) * (b.ndim - 1))
+        if np.any(eig == 0):
+            raise np.linalg.LinAlgError("the circulant matrix is singular")
+        return np.fft.ifft(np.fft.fft(b, axis=0) / eig, axis=0)
+
+    def as_linear_operator(self, dim: int) -> LinearOperator:
+        r"""Get the circulant matrix as a linear operator of SciPy, e.g. for the iterative solvers.
+
+        Args:
+            dim (int): dimension
+
+        Returns:
+            LinearOperator: the circulant matrix
+        """
+        return LinearOperator((dim, dim), matvec=self.matvec, rmatvec=self.rmatvec, matmat=self.matvec,
+                              rmatmat=self.rmatvec, dtype=np.complex128)
+
     def get_matrix(self, dim: int) -> np.ndarray:
-        r"""Get the circulant matrix.
+        r"""Get the dense circulant matrix.
+
+        The matrix takes O(N^2) memory, so it is only meant for small dimensions; the other methods of this class
+        apply the matrix without forming it.
+
+        Args:
+            dim (int): dimension
 
         Returns:
             ndarray: the circulant matrix
         """
-        mat = np.array([[0 for _ in range(dim)] for _ in range(dim)], dtype='complex128')
-        for i in range(self.__term_number):
-            coeff = self.__coeffs[i]
-            power = self.__pows[i]
-            q_mat = get_permutation_matrix(dim, power)
-            mat += coeff * q_mat
-        return mat
+        return circulant(self.get_column(dim))
@@ -1,17 +1,32 @@
 import numpy as np
-from typing import Tuple, Dict
+from typing import Tuple, Dict, List, Optional, Union
 from qiskit import QuantumCircuit, transpile
 from qiskit import QuantumRegister, ClassicalRegister
-from qiskit.circuit import Operation
+from qiskit.circuit import Operation, Parameter
 from qiskit.circuit.library import QFT
 from qiskit.providers import JobV1, Backend
+from qiskit.result import Result
+from circulant_solver.state import get_sparse_b
 
 __all__ = [
     "sample_inner_product",
+    "sample_inner_products",
     "true_inner_product",
+    "fft_inner_products",
+    "emulated_inner_products",
+    "sparse_correlation",
+    "sparse_inner_products",
     "sparse_inner_product",
     "quantum_inner_product_promise",
-    "eval_promise"
+    "eval_promise",
+    "HadamardTestTemplate",
+    "eval_batch_promise",
+    "eval_batch_results",
+    "eval_batch_counts",
+    "get_fourier_sampling_circuit",
+    "quantum_fourier_sampling_promise",
+    "eval_fourier_promise",
+    "eval_fourier_counts"
 ]
 
 
@@ -35,6 +50,81 @@ def sample_inner_product(vec_b: np.ndarray, q_pow: int, shots: int = 1024) -> Tu
     return np.real(result), np.imag(result)
 
 
+def sample_inner_products(vec_b: np.ndarray, power: int, shots: int = 1024, start: int = 0, with_neg: bool = True,
+                          shared: bool = False, rng: Optional[np.random.Generator] = None,
+                          chunk_size: int = 2 ** 22) -> Tuple[np.ndarray, ...]:
+    r"""Estimate the inner products of a range of powers by sampling and querying, with their standard errors.
+
+    The indices i are drawn from the distribution :math:`|b_i|^2`, and :math:`\langle b | Q^p | b \rangle` is
+    estimated by the average of :math:`b_{i - p} / b_i`. Since the average only depends on how often each index is
+    drawn, the samples of a power are drawn as multinomial counts over the N indices if N is not larger than the
+    number of shots, and as indices from the CDF (built once) otherwise. All the powers are then evaluated by
+    vectorized gathers over the grid of powers and indices, in chunks of at most ``chunk_size`` entries,
+    which costs O(power min(N, shots)) instead of O(power (N + shots)).
+
+    Args:
+        vec_b (np.ndarray): vector b
+        power (int): the largest power of permutation matrix
+        shots (int, optional): number of samples per power
+        start (int, optional): only the powers larger than ``start`` are estimated
+        with_neg (bool, optional): whether to estimate the negative powers as well
+        shared (bool, optional): False: draw independent samples for every power and sign;
+                                 True: use the same samples for all of them, so that their errors are correlated
+        rng (np.random.Generator, optional): the random generator, by default a new unseeded one
+        chunk_size (int, optional): bound of the number of entries of the temporary arrays
+
+    Returns:
+        Tuple[np.ndarray, ...]: real and imaginary parts of the inner products with powers start + 1, ..., power
+        and -(start + 1), ..., -power (NaN if not estimated), and the variances of the real and imaginary parts of
+        the estimations of the positive and of the negative powers, i.e. their squared standard errors; the
+        negative powers that are not estimated carry the variances of the conjugate positive powers
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    size = vec_b.size
+    prob = np.abs(vec_b) ** 2
+    prob /= np.sum(prob)
+    cdf = np.cumsum(prob)
+    # The entries with zero probability are never drawn
+    inv_b = np.divide(1, vec_b.astype(np.complex128), out=np.zeros(size, dtype=np.complex128), where=prob > 0)
+    use_counts = size <= shots
+
+    def draw(rows: int) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        # The drawn indices of each row, and their multiplicities (None if every index is drawn once)
+        if use_counts:
+            return np.broadcast_to(np.arange(size), (rows, size)), rng.multinomial(shots, prob, size=rows)
+        samples = np.searchsorted(cdf, rng.random((rows, shots)), side="right")
+        return np.minimum(samples, size - 1), None
+
+    pows = np.arange(start + 1, power + 1)
+    lags = np.concatenate((pows, -pows)) if with_neg else pows
+    estimates = np.full(2 * pows.size, np.nan, dtype=np.complex128)
+    variances = np.full((2, 2 * pows.size), np.nan, dtype=np.float64)
+    if shared:
+        samples, counts = draw(1)
+    step = max(chunk_size // (size if use_counts else max(shots, 1)), 1)
+    for begin in range(0, lags.size, step):
+        chunk = lags[begin:begin + step]
+        if not shared:
+            samples, counts = draw(chunk.size)
+        ratios = vec_b[(samples - chunk[:, np.newaxis]) % size] * inv_b[samples]
+        weighted = ratios if counts is None else counts * ratios
+        mean = np.sum(weighted, axis=1) / shots
+        estimates[begin:begin + chunk.size] = mean
+        if shots > 1:
+            square_real = np.sum(weighted.real * ratios.real, axis=1)
+            square_imag = np.sum(weighted.imag * ratios.imag, axis=1)
+            variances[0, begin:begin + chunk.size] = (square_real - shots * mean.real ** 2) / (shots - 1) / shots
+            variances[1, begin:begin + chunk.size] = (square_imag - shots * mean.imag ** 2) / (shots - 1) / shots
+    if not with_neg:
+        # The conjugate of an estimation has the same variances of its real and imaginary parts
+        variances[:, pows.size:] = variances[:, :pows.size]
+    pos = estimates[:pows.size]
+    neg = estimates[pows.size:]
+    return (np.real(pos), np.imag(pos), np.real(neg), np.imag(neg), variances[0, :pows.size],
+            variances[1, :pows.size], variances[0, pows.size:], variances[1, pows.size:])
+
+
 def true_inner_product(vec_b: np.ndarray, q_pow: int) -> Tuple[float, float]:
     r"""Estimate the inner products by matrix multiplication.
 
@@ -51,6 +141,164 @@ def true_inner_product(vec_b: np.ndarray, q_pow: int) -> Tuple[float, float]:
     return np.real(result), np.imag(result)
 
 
+def fft_inner_products(vec_b: np.ndarray, power: int,
+                       with_neg: bool = True) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    r"""Calculate the inner products of all powers at once by the fast Fourier transformation.
+
+    The inner products :math:`\langle b | Q^p | b \rangle` are the circular autocorrelation of b,
+    which is the inverse Fourier transformation of :math:`|\hat{b}|^2`.
+
+    Args:
+        vec_b (np.ndarray): vector b
+        power (int): the largest power of permutation matrix
+        with_neg (bool, optional): whether to gather the negative powers as well, otherwise they are the
+                                   conjugates of the positive ones
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: real and imaginary parts of the inner products
+        with powers 1, ..., power and -1, ..., -power
+    """
+    size = vec_b.size
+    b_fft = np.fft.fft(vec_b)
+    corr = np.fft.ifft(np.abs(b_fft) ** 2)
+    pows = np.arange(1, power + 1)
+    pos = corr[(-pows) % size]
+    neg = corr[pows % size] if with_neg else np.conj(pos)
+    return np.real(pos), np.imag(pos), np.real(neg), np.imag(neg)
+
+
+def emulated_inner_products(vec_b: np.ndarray, power: int, shots: Union[int, np.ndarray] = 1024, start: int = 0,
+                            with_neg: bool = True,
+                            rng: Optional[np.random.Generator] = None,
+                            readout_error: Optional[Tuple[Union[float, np.ndarray], Union[float, np.ndarray]]] = None
+                            ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    r"""Emulate the shot noise of the Hadamard tests without simulating any circuit.
+
+    The ancilla of the Hadamard test of the real part of :math:`\langle b | Q^p | b \rangle` is measured as 0 with
+    probability :math:`(1 + \mathrm{Re})/2`, and the one of the imaginary part with :math:`(1 - \mathrm{Im})/2`.
+    The exact inner products are calculated once by ``fft_inner_products``, and the counts of 0 of all circuits are
+    drawn by one vectorized binomial draw, which gives the same estimator as running the circuits on a simulator.
+
+    Args:
+        vec_b (np.ndarray): vector b
+        power (int): the largest power of permutation matrix
+        shots (Union[int, np.ndarray], optional): number of measurements, either for all circuits or per circuit
+                                                  as an array broadcastable to the shape (4, power - start);
+                                                  the circuits without measurements are not estimated
+        start (int, optional): only the powers larger than ``start`` are estimated
+        with_neg (bool, optional): whether to estimate the negative powers as well
+        rng (np.random.Generator, optional): the random generator, by default a new unseeded one
+        readout_error (Tuple[Union[float, np.ndarray], Union[float, np.ndarray]], optional): the probabilities to
+            read 1 instead of 0 and 0 instead of 1, either for all circuits or per circuit as arrays broadcastable
+            to the shape (4, power - start) of the circuits of the real and imaginary parts of the positive and
+            negative powers
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: real and imaginary parts of the inner products
+        with powers start + 1, ..., power and -(start + 1), ..., -power (NaN if not estimated)
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    # The exact inner products are conjugate symmetric, so only the positive powers are gathered
+    exact = np.array(fft_inner_products(vec_b, power, with_neg=False))[:, start:]
+    # Probabilities to measure 0, in the order of the real and imaginary parts of the positive and negative powers
+    prob = (1 + exact * np.array([1, -1, 1, -1])[:, np.newaxis]) / 2
+    if readout_error is not None:
+        flip_0, flip_1 = readout_error
+        prob = prob * (1 - np.asarray(flip_0)) + (1 - prob) * np.asarray(flip_1)
+    shots = np.broadcast_to(shots, exact.shape)
+    if not with_neg:
+        shots = np.concatenate((shots[:2], np.zeros_like(shots[2:])))
+    counts = rng.binomial(shots, np.clip(prob, 0, 1))
+    outputs = np.divide(2 * counts, shots, out=np.full(exact.shape, np.nan), where=shots > 0) - 1
+    outputs *= np.array([1, -1, 1, -1])[:, np.newaxis]
+    return outputs[0], outputs[1], outputs[2], outputs[3]
+
+
+def sparse_correlation(indices: np.ndarray, values: np.ndarray, size: int, lags: np.ndarray,
+                       method: Optional[str] = None, chunk_size: int = 2 ** 22) -> np.ndarray:
+    r"""Calculate the circular autocorrelation :math:`\sum_i \overline{b_i} b_{i - l}` of a sparse b at given lags.
+
+    The lags are computed in one vectorized pass by one of three methods, by default the cheapest:
+
+        "pairs": a histogram of the offsets of all pairs of nonzero entries, in O(nnz^2);
+        "search": a binary search of the shifted indices in the sorted indices, in O(L nnz log nnz) for L lags;
+        "fft": the Fourier transformation of the dense vector, in O(N log N).
+
+    Args:
+        indices (np.ndarray): sorted unique indices of the nonzero entries, see ``get_sparse_b``
+        values (np.ndarray): values of the nonzero entries
+        size (int): the size of b
+        lags (np.ndarray): the lags l, taken modulo the size
+        method (str, optional): "pairs", "search" or "fft"
+        chunk_size (int, optional): bound of the number of entries of the temporary arrays
+
+    Returns:
+        np.ndarray: the complex correlation at each lag
+    """
+    lags = np.asarray(lags, dtype=np.int64)
+    residues, inverse = np.unique(np.mod(lags, size), return_inverse=True)
+    nnz = indices.size
+    corr = np.zeros(residues.size, dtype=np.complex128)
+    if nnz == 0 or residues.size == 0:
+        return corr[inverse]
+    costs = {"pairs": nnz * nnz,
+             "search": residues.size * nnz * max(np.log2(nnz), 1),
+             "fft": 5 * size * max(np.log2(size), 1)}
+    if method is None:
+        method = min(costs, key=costs.get)
+    elif method not in costs:
+        raise NotImplementedError(f"unknown method {method}")
+    conj_values = np.conj(values)
+    if method == "fft":
+        vec_b = np.zeros(size, dtype=np.complex128)
+        vec_b[indices] = values
+        b_fft = np.fft.fft(vec_b)
+        corr = np.fft.ifft(np.abs(b_fft) ** 2)[(-residues) % size]
+    elif method == "pairs":
+        # The pair (i, j) contributes to the lag (i - j) mod size
+        step = max(chunk_size // nnz, 1)
+        for start in range(0, nnz, step):
+            offsets = np.mod(indices[start:start + step, np.newaxis] - indices[np.newaxis, :], size).reshape(-1)
+            weights = (conj_values[start:start + step, np.newaxis] * values[np.newaxis, :]).reshape(-1)
+            pos = np.minimum(np.searchsorted(residues, offsets), residues.size - 1)
+            hit = residues[pos] == offsets
+            corr += np.bincount(pos[hit], weights=weights.real[hit], minlength=residues.size)
+            corr += 1j * np.bincount(pos[hit], weights=weights.imag[hit], minlength=residues.size)
+    else:
+        step = max(chunk_size // nnz, 1)
+        for start in range(0, residues.size, step):
+            targets = np.mod(indices[np.newaxis, :] - residues[start:start + step, np.newaxis], size)
+            pos = np.minimum(np.searchsorted(indices, targets), nnz - 1)
+            shifted = np.where(indices[pos] == targets, values[pos], 0)
+            corr[start:start + step] = shifted @ conj_values
+    return corr[inverse]
+
+
+def sparse_inner_products(indices: np.ndarray, values: np.ndarray, size: int, power: int, start: int = 0,
+                          with_neg: bool = True) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    r"""Calculate the inner products of a sparse b for a range of powers at once.
+
+    Args:
+        indices (np.ndarray): sorted unique indices of the nonzero entries, see ``get_sparse_b``
+        values (np.ndarray): values of the nonzero entries
+        size (int): the size of b
+        power (int): the largest power of permutation matrix
+        start (int, optional): only the powers larger than ``start`` are calculated
+        with_neg (bool, optional): whether to calculate the negative powers as well, otherwise they are the
+                                   conjugates of the positive ones, which halves the number of lags
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: real and imaginary parts of the inner products
+        with powers start + 1, ..., power and -(start + 1), ..., -power
+    """
+    pows = np.arange(start + 1, power + 1)
+    corr = sparse_correlation(indices, values, size, np.concatenate((pows, -pows)) if with_neg else pows)
+    pos = corr[:pows.size]
+    neg = corr[pows.size:] if with_neg else np.conj(pos)
+    return np.real(pos), np.imag(pos), np.real(neg), np.imag(neg)
+
+
 def sparse_inner_product(dict_b: Dict[int, complex], q_pow: int, size: int) -> Tuple[float, float]:
     r"""Estimate the inner products by simple shifting the elements.
 
@@ -62,15 +310,8 @@ def sparse_inner_product(dict_b: Dict[int, complex], q_pow: int, size: int) -> T
     Returns:
         Tuple[float, float]: real and imaginary part of the inner product
     """
-    result = 0
-    for idx, value in dict_b.items():
-        shifted_idx = idx - q_pow
-        if shifted_idx >= size:
-            shifted_idx -= size
-        if shifted_idx < -size:
-            shifted_idx += size
-        if shifted_idx in dict_b:
-            result += np.conj(value) * dict_b[shifted_idx]
+    indices, values, size = get_sparse_b((dict_b, size))
+    result = sparse_correlation(indices, values, size, np.array([q_pow]))[0]
     return np.real(result), np.imag(result)
 
 
@@ -131,6 +372,18 @@ def eval_promise(job: JobV1) -> float:
     """
     out_ = job.result()
     count = out_.get_counts()
+    return _eval_counts(count)
+
+
+def _eval_counts(count: Dict[str, int]) -> float:
+    r"""Estimate the inner product from the measurement counts of the ancilla of a Hadamard test.
+
+    Args:
+        count (Dict[str, int]): measurement counts
+
+    Returns:
+        float: the estimation of the inner product by statistics
+    """
     new_count = {'0': 0, '1': 0}
     for k in count.keys():
         new_count[k[-1]] += count[k]
@@ -149,7 +402,245 @@ def eval_promise(job: JobV1) -> float:
     return output
 
 
+class HadamardTestTemplate:
+    r"""Set the parameterized Hadamard test circuits.
+
+    The Hadamard test circuits of different powers only differ in the phases of the controlled rotations,
+    which are :math:`2^i \phi` on the i-th qubit with :math:`\phi = 2 \pi q / N`.
+    This class builds the circuits for the real and imaginary parts once with :math:`\phi` as a circuit parameter
+    and transpiles them once for the backend. The circuits of all powers are then obtained by binding the parameter
+    and submitted together in as few jobs as the backend allows.
+
+    Attributes:
+        U_b_gate (Operation): the unitary circuit used to prepare the vector b
+        width (int): width of the circuit
+        backend (Backend): the backend supported on Qiskit
+    """
+
+    def __init__(self, U_b_gate: Operation, width: int, backend: Backend):
+        r"""Set the parameterized Hadamard test circuits.
+
+        Args:
+            U_b_gate (Operation): the unitary circuit used to prepare the vector b
+            width (int): width of the circuit
+            backend (Backend): the backend supported on Qiskit
+        """
+        self.width = width
+        self.backend = backend
+        self.phi = Parameter('phi')
+        ancilla = 1
+        q_had = QuantumRegister(width + ancilla, 'q')
+        c_had = ClassicalRegister(1, 'c')
+        qft_gate = QFT(num_qubits=width, inverse=False, name='qft').to_gate()
+        self.templates = {}
+        for imag in [False, True]:
+            Hadamard_circuit = QuantumCircuit(q_had, c_had)
+            Hadamard_circuit.h(q_had[0])
+            if imag:
+                Hadamard_circuit.s(q_had[0])
+            Hadamard_circuit.append(U_b_gate, [q_had[i] for i in range(ancilla, width + ancilla)])
+            Hadamard_circuit.append(qft_gate, [q_had[i] for i in range(ancilla, width + ancilla)])
+            # The controlled rotations of all qubits, equivalent to the controlled version of the rotation circuit
+            for i in range(width):
+                Hadamard_circuit.cp((2 ** i) * self.phi, q_had[0], q_had[ancilla + i])
+            Hadamard_circuit.h(q_had[0])
+            Hadamard_circuit.measure([q_had[0]], [c_had[0]])
+            # Transpile the circuit for Hadamard test only once
+            self.templates[imag] = transpile(Hadamard_circuit, backend)
+
+    def get_circuits(self, q_pows: List[int], imag: bool = False) -> List[QuantumCircuit]:
+        r"""Get the transpiled Hadamard test circuits of the given powers.
+
+        Args:
+            q_pows (List[int]): the powers of permutation matrix
+            imag (bool, optional): False: calculate the real part;
+                                   True: calculate the imaginary part
+
+        Returns:
+            List[QuantumCircuit]: the circuits with bound parameters
+        """
+        template = self.templates[imag]
+        return [template.assign_parameters({self.phi: (2 * q_pow * np.pi) / (2 ** self.width)})
+                for q_pow in q_pows]
+
+    def get_batches(self, q_pows: List[int]) -> List[List[QuantumCircuit]]:
+        r"""Get the Hadamard tests of the real and imaginary parts of the given powers, split into jobs.
+
+        The circuits are ordered as the real parts of all powers followed by the imaginary parts of all powers.
+        They form a single job, unless the backend limits the number of circuits per job.
+
+        Args:
+            q_pows (List[int]): the powers of permutation matrix
+
+        Returns:
+            List[List[QuantumCircuit]]: the circuits of each job, in order
+        """
+        circuits = self.get_circuits(q_pows, imag=False) + self.get_circuits(q_pows, imag=True)
+        max_circuits = self.max_circuits or max(len(circuits), 1)
+        return [circuits[i:i + max_circuits] for i in range(0, len(circuits), max_circuits)]
+
+    @property
+    def max_circuits(self) -> Optional[int]:
+        r"""Get the maximal number of circuits per job of the backend.
+
+        Returns:
+            Optional[int]: the maximal number of circuits per job; None if the backend sets no limit
+        """
+        max_circuits = getattr(self.backend, "max_circuits", None)
+        if max_circuits is None and hasattr(self.backend, "configuration"):
+            max_circuits = getattr(self.backend.configuration(), "max_experiments", None)
+        return max_circuits or None
+
+    def run(self, q_pows: List[int], shots: int = 1024) -> List[JobV1]:
+        r"""Submit the Hadamard tests of the real and imaginary parts of the given powers.
+
+        Args:
+            q_pows (List[int]): the powers of permutation matrix
+            shots (int, optional): number of measurements
+
+        Returns:
+            List[JobV1]: submitted jobs, in the order of ``get_batches``
+        """
+        return [self.backend.run(circuits, shots=shots) for circuits in self.get_batches(q_pows)]
+
+
+def eval_batch_promise(jobs: List[JobV1]) -> np.ndarray:
+    r"""Retrieve the results of submitted jobs of multiple Hadamard test circuits.
+
+    Args:
+        jobs (List[JobV1]): submitted jobs, each containing one or more Hadamard test circuits
+
+    Returns:
+        np.ndarray: the estimations of the inner products of all circuits, in order
+    """
+    return eval_batch_results([job.result() for job in jobs])
+
+
+def eval_batch_results(results: List[Result]) -> np.ndarray:
+    r"""Estimate the inner products from the results of jobs of multiple Hadamard test circuits.
+
+    Args:
+        results (List[Result]): results of the jobs, each containing one or more Hadamard test circuits
+
+    Returns:
+        np.ndarray: the estimations of the inner products of all circuits, in order
+    """
+    counts = []
+    for result in results:
+        count = result.get_counts()
+        counts.extend([count] if isinstance(count, dict) else count)
+    return eval_batch_counts(counts)
+
+
+def eval_batch_counts(counts: List[Dict[str, int]]) -> np.ndarray:
+    r"""Estimate the inner products from the measurement counts of multiple Hadamard test circuits.
+
+    Args:
+        counts (List[Dict[str, int]]): measurement counts of each circuit
+
+    Returns:
+        np.ndarray: the estimations of the inner products of all circuits, in order
+    """
+    return np.array([_eval_counts(count) for count in counts], dtype=np.float64)
+
+
+def get_fourier_sampling_circuit(U_b_gate: Operation, width: int, backend: Backend) -> QuantumCircuit:
+    r"""Get the transpiled circuit sampling the Fourier distribution of b.
+
+    Args:
+        U_b_gate (Operation): the unitary circuit used to prepare the vector b
+        width (int): width of the circuit
+        backend (Backend): the backend supported on Qiskit
+
+    Returns:
+        QuantumCircuit: the transpiled circuit QFT U_b measured in the computational basis
+    """
+    q_fou = QuantumRegister(width, 'q')
+    c_fou = ClassicalRegister(width, 'c')
+    qft_gate = QFT(num_qubits=width, inverse=False, name='qft').to_gate()
+    Fourier_circuit = QuantumCircuit(q_fou, c_fou)
+    Fourier_circuit.append(U_b_gate, [q_fou[i] for i in range(width)])
+    Fourier_circuit.append(qft_gate, [q_fou[i] for i in range(width)])
+    Fourier_circuit.measure([q_fou[i] for i in range(width)], [c_fou[i] for i in range(width)])
+    return transpile(Fourier_circuit, backend)
+
+
+def quantum_fourier_sampling_promise(U_b_gate: Operation, width: int, backend: Backend, shots: int = 1024) -> JobV1:
+    r"""Sample the Fourier distribution of b, from which the inner products of all powers are estimated.
+
+    Since :math:`Q^p` is diagonalized by the QFT, we have
+    :math:`\langle b | Q^p | b \rangle = \sum_k |\hat{b}_k|^2 e^{2 \pi i p k / N}`,
+    where :math:`|\hat{b}_k|^2` is the output distribution of the circuit QFT U_b in the computational basis.
+    Hence a single circuit without ancilla or controlled rotations suffices for all powers.
+
+    Args:
+        U_b_gate (Operation): the unitary circuit used to prepare the vector b
+        width (int): width of the circuit
+        backend (Backend): the backend supported on Qiskit
+        shots (int, optional): number of measurements
+
+    Returns:
+        JobV1: submitted job corresponding to the Fourier sampling task
+    """
+    circuit = get_fourier_sampling_circuit(U_b_gate, width, backend)
+    job = backend.run(circuit, shots=shots)
+    return job
+
+
+def eval_fourier_promise(job: JobV1, width: int, power: int, start: int = 0) -> Tuple[np.ndarray, np.ndarray,
+                                                                                       np.ndarray, np.ndarray]:
+    r"""Estimate the inner products of the powers start + 1, ..., power from the results of a Fourier sampling job.
+
+    Args:
+        job (JobV1): submitted job corresponding to the Fourier sampling task
+        width (int): width of the circuit
+        power (int): the largest power of permutation matrix
+        start (int, optional): the powers up to ``start`` are skipped
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: estimations of the real and imaginary parts,
+        and their variances
+    """
+    return eval_fourier_counts(job.result().get_counts(), width, power, start)
+
+
+def eval_fourier_counts(count: Dict[str, int], width: int, power: int, start: int = 0) -> Tuple[np.ndarray,
+                                                                                                np.ndarray,
+                                                                                                np.ndarray,
+                                                                                                np.ndarray]:
+    r"""Estimate the inner products of the powers start + 1, ..., power from the Fourier sampling counts.
+
+    The inner products of negative powers are the complex conjugates of the returned values.
+    The variances are the shot-noise variances of the estimators, i.e. the sample variances of the phases
+    :math:`\cos(2 \pi p k / N)` and :math:`\sin(2 \pi p k / N)` divided by the number of shots.
+
+    Args:
+        count (Dict[str, int]): measurement counts of the Fourier sampling circuit
+        width (int): width of the circuit
+        power (int): the largest power of permutation matrix
+        start (int, optional): the powers up to ``start`` are skipped
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: estimations of the real and imaginary parts,
+        and their variances
+    """
+    outcomes = np.array([int(k.replace(' ', ''), 2) for k in count.keys()], dtype=np.int64)
+    freqs = np.array(list(count.values()), dtype=np.float64)
+    shots = np.sum(freqs)
+    probs = freqs / shots
+    pows = np.arange(start + 1, power + 1)
+    phases = 2 * np.pi * ((pows[:, np.newaxis] * outcomes[np.newaxis, :]) % (2 ** width)) / (2 ** width)
+    cos = np.cos(phases)
+    sin = np.sin(phases)
+    real = cos @ probs
+    imag = sin @ probs
+    var_real = np.maximum((cos ** 2) @ probs - real ** 2, 0) / shots
+    var_imag = np.maximum((sin ** 2) @ probs - imag ** 2, 0) / shots
+    return real, imag, var_real, var_imag
+
+
 # Test
 if __name__ == "__main__":
     print(sample_inner_product(np.arange(16) / np.sqrt(1240), 2))
     print(true_inner_product(np.arange(16) / np.sqrt(1240), 2))
+    print(fft_inner_products(np.arange(16) / np.sqrt(1240), 2))
@@ -1,19 +1,29 @@
-import time
 from datetime import datetime
 
 import numpy as np
-from typing import Union, Tuple, Dict
-from qiskit import QuantumCircuit, QuantumRegister, execute, Aer
+from typing import Union, Tuple, Dict, Optional
+from qiskit import QuantumCircuit, QuantumRegister
+from qiskit.circuit import Operation
 from qiskit.quantum_info import Statevector
-from qiskit.providers import JobStatus
 from circulant_solver.dot_compute import *
-from circulant_solver.util import get_backend
+from circulant_solver.util import get_backend, get_backend_name
+from circulant_solver.state import get_vector_b, get_b_hash, get_sparse_b
+from circulant_solver.scheduler import JobScheduler, get_scheduler
+from circulant_solver.ledger import JobLedger
+from circulant_solver.cache import InnerProductCache
 import logging
+from collections import OrderedDict
 
 __all__ = [
     "InnerProduct"
 ]
 
+logger = logging.getLogger(__name__)
+
+# The transpiled templates of the recently used b and backends, shared by all InnerProduct instances
+_TEMPLATE_CACHE = OrderedDict()
+_TEMPLATE_CACHE_SIZE = 8
+
 
 class InnerProduct():
     r"""Set the inner product class.
@@ -28,10 +38,22 @@ class InnerProduct():
         term_number (int): number of decomposition terms
         threshold (int): truncated threshold of our algorithm
         shots (int, optional): number of measurements
+        symmetry (str, optional): how to use the conjugate symmetry of the inner products
+        scheduler (JobScheduler, optional): the scheduler of the jobs on Qiskit backends
+        ledger (JobLedger, optional): the persistent ledger of the jobs on Qiskit backends
+        cache (InnerProductCache, optional): the on-disk cache of inner product tables
     """
 
+    # Names of the recorded arrays, indexed by the power minus one
+    _RECORDS = ["pos_inner_product_real", "pos_inner_product_imag", "neg_inner_product_real",
+                "neg_inner_product_imag", "variance_real", "variance_imag"]
+
     def __init__(self, access: str, b: Union[np.ndarray, QuantumCircuit, Tuple[Dict[int, complex], int]],
-                 term_number: int, threshold: int, shots: int = 1024):
+                 term_number: int, threshold: int, shots: int = 1024, symmetry: Optional[str] = None,
+                 scheduler: Optional[JobScheduler] = None, ledger: Optional[JobLedger] = None,
+                 cache: Optional[InnerProductCache] = None, records: Optional[Dict[str, np.ndarray]] = None,
+                 rng: Optional[Union[int, np.random.Generator]] = None, shared_samples: bool = False,
+                 readout_error: Optional[Tuple[float, float]] = None):
         r"""Set the inner product class.
 
         This class records the inner products used for calculating the auxiliary systems W and r.
@@ -39,24 +61,121 @@ class InnerProduct():
         record the values into instances of this class. Then we can obtain the values by indexes.
 
         Args:
-            access (str): different access to the backend
-            b (Union[np.ndarray, QuantumCircuit, Tuple[Dict[int, complex], int]]): quantum circuit for preparing b
+            access (str): different access to the backend; prefixing a Qiskit access with "fourier-"
+                          estimates all inner products from one Fourier sampling circuit instead of Hadamard tests
+            b (Union[np.ndarray, QuantumCircuit, Tuple[Dict[int, complex], int]]): quantum circuit for preparing b;
+                for the sparse access, either (dictionary from indices to values, size)
+                or (array of indices, array of values, size)
             term_number (int): number of decomposition terms
             threshold (int): truncation threshold of our algorithm
             shots (int, optional): number of measurements
+            symmetry (str, optional): since :math:`\langle b | Q^{-p} | b \rangle` is the complex conjugate of
+                                      :math:`\langle b | Q^{p} | b \rangle`, there are three options:
+                                      "derive": only estimate the positive powers and derive the negative ones;
+                                      "pool": estimate both and average them into one symmetric estimate;
+                                      "none": estimate both independently.
+                                      By default, "derive" for the exact and Fourier accesses, for which it is
+                                      the only option, and "none" otherwise.
+            scheduler (JobScheduler, optional): the scheduler of the jobs on Qiskit backends;
+                                                by default, the scheduler shared by all instances
+            ledger (JobLedger, optional): the persistent ledger of the jobs on Qiskit backends, which makes an
+                                          interrupted run resumable; by default, no job is recorded
+            cache (InnerProductCache, optional): the on-disk cache of inner product tables, shared by all circulant
+                                                 matrices and experiments with the same b, access and shots;
+                                                 by default, nothing is cached
+            records (Dict[str, np.ndarray], optional): the recorded arrays of a previous computation with the same
+                                                       b, access and shots, e.g. in shared memory; they are used in
+                                                       place (read-only arrays are copied before any extension),
+                                                       and only the missing powers are calculated
+            rng (Union[int, np.random.Generator], optional): the random generator of the "sample" and
+                                                             "emulated-shots" accesses, or its seed; the seed
+                                                             is part of the cache key, and these accesses
+                                                             bypass the cache if a generator is given
+            shared_samples (bool, optional): whether the "sample" access uses the same samples for all powers,
+                                             which correlates their errors, instead of independent samples
+            readout_error (Tuple[float, float], optional): the probabilities of the "emulated-shots" access to read
+                                                           1 instead of 0 and 0 instead of 1, see
+                                                           ``emulated_inner_products``
         """
         self.access = access
         self.shots = shots
         self.b = b
-        self.power = 2 * term_number + 2 * threshold
-        self.pos_inner_product_real = np.empty(self.power, dtype=np.float64)
-        self.pos_inner_product_imag = np.empty(self.power, dtype=np.float64)
-        self.neg_inner_product_real = np.empty(self.power, dtype=np.float64)
-        self.neg_inner_product_imag = np.empty(self.power, dtype=np.float64)
-        self.non_q = ["true", "sample", "sparse"]
+        self.term_number = term_number
+        self.threshold = threshold
+        self.power = 0
+        self.non_q = ["true", "fft", "sample", "sparse", "emulated-shots"]
+        self.exact = ["true", "fft", "sparse"]
+        self.fourier = self.access.startswith("fourier-")
+        if symmetry is None:
+            symmetry = "derive" if self.access in self.exact or self.fourier else "none"
+        if symmetry not in ["derive", "pool", "none"]:
+            raise ValueError(f"unknown symmetry option {symmetry}")
+        if self.fourier and symmetry != "derive":
+            raise ValueError(f"the {self.access} access always derives the negative powers, "
+                             f"but the symmetry option is {symmetry}")
+        self.symmetry = symmetry
         if self.access not in self.non_q:
-            self.backend = get_backend(self.access)
-        self._calculate_inner_product()
+            self.backend = get_backend(self.access[len("fourier-"):] if self.fourier else self.access)
+        self.scheduler = scheduler
+        self.ledger = ledger
+        self.cache = cache
+        self.rng = np.random.default_rng(rng)
+        # The seed is part of the cache key of the simulated estimators, a generator cannot be keyed
+        self._seed = None if rng is None or isinstance(rng, np.random.Generator) else int(rng)
+        self._keyed_rng = not isinstance(rng, np.random.Generator)
+        self.shared_samples = shared_samples
+        self.readout_error = readout_error
+        self._fourier_counts = None
+        # Numbers of measurements added by ``refine`` to the circuits of the positive and negative powers
+        self._extra_shots = np.zeros((4, 0), dtype=np.int64)
+        if records is None:
+            self.__buffers = {name: np.empty(0, dtype=np.float64) for name in self._RECORDS}
+        else:
+            self.__buffers = {name: records[name] for name in self._RECORDS}
+            self.power = min(buffer.size for buffer in self.__buffers.values())
+        start = self.power
+        self._resize(2 * term_number + 2 * threshold)
+        if self.power > start:
+            self._load_inner_product(start)
+
+    def extend(self, threshold: int):
+        r"""Extend the inner products in place to a larger truncation threshold.
+
+        Only the newly required powers are calculated; the recorded values are kept as they are,
+        so that no inner product (or job on the hardware) is ever repeated.
+
+        Args:
+            threshold (int): the new truncation threshold
+        """
+        if threshold <= self.threshold:
+            return
+        start = self.power
+        self.threshold = threshold
+        self._resize(2 * self.term_number + 2 * threshold)
+        self._load_inner_product(start)
+
+    def _resize(self, power: int, copy: bool = False):
+        r"""Resize the recorded arrays to the given power.
+
+        The arrays are views of buffers whose capacity grows geometrically, so that repeated extensions
+        only cost an amortized constant time per power.
+
+        Args:
+            power (int): the new largest power
+            copy (bool, optional): whether to copy read-only buffers even if no power is added
+        """
+        for name in self._RECORDS:
+            buffer = self.__buffers[name]
+            if power > buffer.size or ((power > self.power or copy) and not buffer.flags.writeable):
+                new_buffer = np.empty(max(power, 2 * buffer.size), dtype=np.float64)
+                new_buffer[:self.power] = buffer[:self.power]
+                self.__buffers[name] = buffer = new_buffer
+            setattr(self, name, buffer[:power])
+        # Variances of the estimations of the positive powers; NaN if not available
+        if power > self.power:
+            self.variance_real[self.power:] = np.nan
+            self.variance_imag[self.power:] = np.nan
+        self.power = power
 
     def get_inner_product(self, q_pow: int, imag: bool = False):
         r"""Get the value of an inner product.
@@ -82,108 +201,335 @@ class InnerProduct():
         elif q_pow < 0 and imag:
             return self.neg_inner_product_imag[-(q_pow) - 1]
 
-    def _calculate_inner_product(self):
+    def get_inner_product_table(self) -> np.ndarray:
+        r"""Get all the inner products as one contiguous complex lookup table.
+
+        The entry with index ``power + q_pow`` of the table is the inner product with power ``q_pow``,
+        so that all powers from ``-power`` to ``power`` can be gathered at once by array indexing.
+
+        Returns:
+            np.ndarray: complex array of length ``2 * power + 1``
+        """
+        table = np.empty(2 * self.power + 1, dtype=np.complex128)
+        table.real[:self.power] = self.neg_inner_product_real[::-1]
+        table.imag[:self.power] = self.neg_inner_product_imag[::-1]
+        table[self.power] = 1
+        table.real[self.power + 1:] = self.pos_inner_product_real
+        table.imag[self.power + 1:] = self.pos_inner_product_imag
+        return table
+
+    def _load_inner_product(self, start: int = 0):
+        r"""Load the inner products from the cache if possible, and calculate the others.
+
+        Args:
+            start (int, optional): only the powers larger than ``start`` are loaded or calculated
+        """
+        simulated = self.access in ["sample", "emulated-shots"]
+        if self.cache is None or (simulated and not self._keyed_rng):
+            self._calculate_inner_product(start)
+            return
+        # The exact accesses do not depend on the number of shots
+        shots = 0 if self.access in self.exact else self.shots
+        # The options of the simulated estimators change the estimations, so they are part of the key
+        options = {"readout_error": self.readout_error if self.access == "emulated-shots" else None,
+                   "shared_samples": True if self.access == "sample" and self.shared_samples else None,
+                   "seed": self._seed if simulated else None}
+        key = InnerProductCache.get_key(get_b_hash(self.b), self.access, shots, self.symmetry, options)
+        records = self.cache.load(key)
+        cached = 0 if records is None else min(min(records[name].size for name in self._RECORDS), self.power)
+        for name in self._RECORDS:
+            if cached > start:
+                getattr(self, name)[start:cached] = records[name][start:cached]
+        if cached < self.power:
+            self._calculate_inner_product(max(start, cached))
+            if not np.any(self._extra_shots):
+                self.cache.store(key, {name: getattr(self, name) for name in self._RECORDS})
+            elif records is not None and cached >= start:
+                # The estimations refined by ``refine`` are replaced by the cached ones with the base number of shots
+                self.cache.store(key, {name: np.concatenate((records[name][:start], getattr(self, name)[start:]))
+                                       for name in self._RECORDS})
+
+    def _calculate_inner_product(self, start: int = 0):
         r"""Calculate the inner product according to the access.
 
-        If the access is "sparse", calculate the inner product using the sparce matrix estimator;
+        If the access is "sparse", calculate the inner products from the nonzero entries of b;
         If the access is "true", calculate the inner product using the matrix multiplication estimator;
+        If the access is "fft", calculate all the inner products at once using the fast Fourier transformation;
         If the access is "sample", calculate the inner product using sampling and querying estimator;
+        If the access is "emulated-shots", draw the shot counts of the Hadamard tests from the exact inner products;
+        If the access is "fourier-" followed by a Qiskit access, estimate all the inner products by sampling
+        the single circuit QFT U_b;
         Else, calculate the inner product using the Hadamard test with backends provided by Qiskit;
+
+        Unless the symmetry option is "derive", the inner products with negative powers are estimated as well.
+
+        Args:
+            start (int, optional): only the powers larger than ``start`` are calculated
         """
+        with_neg = self.symmetry != "derive"
+        if self.access in self.exact:
+            self.variance_real[start:] = 0
+            self.variance_imag[start:] = 0
         if self.access == "sparse":
             if not isinstance(self.b, tuple):
-                raise NotImplementedError("sparse mode is used with input Tuple[Dict[idx, value], size]")
-            dict_b, size = self.b
-            for i in range(self.power):
-                self.pos_inner_product_real[i], self.pos_inner_product_imag[i] = sparse_inner_product(dict_b, i + 1,
-                                                                                                      size)
-                self.neg_inner_product_real[i], self.neg_inner_product_imag[i] = sparse_inner_product(dict_b, -(i + 1),
-                                                                                                      size)
-        elif self.access == "true" or self.access == "sample":
-            if isinstance(self.b, np.ndarray):
-                vec_b = self.b
-            else:
-                if isinstance(self.b, QuantumCircuit):
-                    sim = Aer.get_backend('unitary_simulator')
-                    job = execute(self.b, sim)
-                    result = job.result()
-                    mat = result.get_unitary(self.b, decimals=16)
-                    vec_b = np.transpose(mat)[0]
+                raise NotImplementedError("sparse mode is used with input Tuple[Dict[idx, value], size] "
+                                          "or Tuple[indices, values, size]")
+            # All the new powers are calculated in one vectorized pass over the sorted nonzero entries
+            pos_real, pos_imag, neg_real, neg_imag = sparse_inner_products(*get_sparse_b(self.b), self.power, start,
+                                                                           with_neg)
+            self.pos_inner_product_real[start:] = pos_real
+            self.pos_inner_product_imag[start:] = pos_imag
+            if with_neg:
+                self.neg_inner_product_real[start:] = neg_real
+                self.neg_inner_product_imag[start:] = neg_imag
+        elif self.access in ["true", "fft", "sample", "emulated-shots"]:
+            vec_b = get_vector_b(self.b)
             if self.access == "true":
-                for i in range(self.power):
+                for i in range(start, self.power):
                     self.pos_inner_product_real[i], self.pos_inner_product_imag[i] = true_inner_product(vec_b, i + 1)
-                    self.neg_inner_product_real[i], self.neg_inner_product_imag[i] = true_inner_product(vec_b, -(i + 1))
+                    if with_neg:
+                        self.neg_inner_product_real[i], self.neg_inner_product_imag[i] = true_inner_product(vec_b,
+                                                                                                            -(i + 1))
+            elif self.access == "fft":
+                pos_real, pos_imag, neg_real, neg_imag = fft_inner_products(vec_b, self.power, with_neg)
+                self.pos_inner_product_real[start:] = pos_real[start:]
+                self.pos_inner_product_imag[start:] = pos_imag[start:]
+                if with_neg:
+                    self.neg_inner_product_real[start:] = neg_real[start:]
+                    self.neg_inner_product_imag[start:] = neg_imag[start:]
             elif self.access == "sample":
-                for i in range(self.power):
-                    self.pos_inner_product_real[i], self.pos_inner_product_imag[i] = sample_inner_product(vec_b, i + 1,
-                                                                                                          self.shots)
-                    self.neg_inner_product_real[i], self.neg_inner_product_imag[i] = sample_inner_product(vec_b,
-                                                                                                          -(i + 1),
-                                                                                                          self.shots)
+                (self.pos_inner_product_real[start:], self.pos_inner_product_imag[start:], neg_real, neg_imag,
+                 self.variance_real[start:], self.variance_imag[start:],
+                 neg_variance_real, neg_variance_imag) = sample_inner_products(vec_b, self.power, self.shots, start,
+                                                                               with_neg, self.shared_samples,
+                                                                               self.rng)
+                if with_neg:
+                    self.neg_inner_product_real[start:] = neg_real
+                    self.neg_inner_product_imag[start:] = neg_imag
+                if self.symmetry == "pool":
+                    # The pooled estimation averages the two conjugate estimations, whose variances may differ;
+                    # ``_apply_symmetry`` halves the mean variance
+                    self.variance_real[start:] = (self.variance_real[start:] + neg_variance_real) / 2
+                    self.variance_imag[start:] = (self.variance_imag[start:] + neg_variance_imag) / 2
+            elif self.access == "emulated-shots":
+                pos_real, pos_imag, neg_real, neg_imag = emulated_inner_products(vec_b, self.power, self.shots, start,
+                                                                                 with_neg, self.rng,
+                                                                                 self.readout_error)
+                self.pos_inner_product_real[start:] = pos_real
+                self.pos_inner_product_imag[start:] = pos_imag
+                # Shot-noise variance of the Hadamard test estimator p0 - p1, as for the Qiskit backends
+                self.variance_real[start:] = (1 - pos_real ** 2) / self.shots
+                self.variance_imag[start:] = (1 - pos_imag ** 2) / self.shots
+                if with_neg:
+                    self.neg_inner_product_real[start:] = neg_real
+                    self.neg_inner_product_imag[start:] = neg_imag
         else:
-            if isinstance(self.b, np.ndarray):
-                width = int(np.log2(self.b.size))
-                q_b = QuantumRegister(width, 'q')
-                q_b_cir = QuantumCircuit(q_b)
-                U_b = q_b_cir.prepare_state(state=Statevector(self.b)).instructions[0]
+            U_b, width = self._get_U_b()
+            start_time = datetime.now()
+            logger.warning(f"access: {self.access}, shots: {self.shots}, power:{self.power}")
+            scheduler = get_scheduler() if self.scheduler is None else self.scheduler
+            if self.fourier:
+                # All the powers are estimated from the same samples, which are conjugate symmetric by construction;
+                # an extension reuses the samples of the first job
+                if self._fourier_counts is None:
+                    circuit = get_fourier_sampling_circuit(U_b, width, self.backend)
+                    if self.ledger is None:
+                        result = scheduler.submit(self.backend, [circuit], self.shots).result()
+                        self._fourier_counts = result.get_counts()
+                    else:
+                        key = JobLedger.get_key(get_b_hash(self.b), "fourier", False, self.shots, self.backend)
+                        self._fourier_counts = self.ledger.run(scheduler, self.backend, [circuit], [key],
+                                                               self.shots)[0]
+                (self.pos_inner_product_real[start:], self.pos_inner_product_imag[start:],
+                 self.variance_real[start:], self.variance_imag[start:]) = eval_fourier_counts(self._fourier_counts,
+                                                                                               width, self.power,
+                                                                                               start)
+                self.neg_inner_product_real[start:] = self.pos_inner_product_real[start:]
+                self.neg_inner_product_imag[start:] = -self.pos_inner_product_imag[start:]
+                return
+            # The Hadamard tests of all new powers are bound from the same transpiled template and submitted together
+            template = self._get_template()
+            pos_pows = list(range(start + 1, self.power + 1))
+            q_pows = pos_pows + [-q_pow for q_pow in pos_pows] if with_neg else pos_pows
+            if self.ledger is None:
+                futures = [scheduler.submit(self.backend, circuits, self.shots)
+                           for circuits in template.get_batches(q_pows)]
+                outputs = eval_batch_results(scheduler.gather(futures))
             else:
-                U_b = self.b.to_gate()
-                width = U_b.num_qubits
-            promise_queue = []
-            pr = []
-            pi = []
-            nr = []
-            ni = []
-            for i in range(self.power):
-                pos_real = quantum_inner_product_promise(U_b, width, self.backend, i + 1, shots=self.shots, imag=False)
-                pos_imag = quantum_inner_product_promise(U_b, width, self.backend, i + 1, shots=self.shots, imag=True)
-                neg_real = quantum_inner_product_promise(U_b, width, self.backend, -(i + 1), shots=self.shots,
-                                                         imag=False)
-                neg_imag = quantum_inner_product_promise(U_b, width, self.backend, -(i + 1), shots=self.shots,
-                                                         imag=True)
-                promise_queue.append(pos_real)
-                promise_queue.append(pos_imag)
-                promise_queue.append(neg_real)
-                promise_queue.append(neg_imag)
-                pr.append(pos_real)
-                pi.append(pos_imag)
-                nr.append(neg_real)
-                ni.append(neg_imag)
-
-            start = datetime.now()
-            logging.basicConfig(format='%(asctime)s - %(message)s', level=logging.WARNING,
-                                handlers=[logging.FileHandler(f"queue_{start.strftime('%Y%m%d%H%M%S')}.log"),
-                                          logging.StreamHandler()])
-            logging.warning(f"access: {self.access}, shots: {self.shots}, power:{self.power}")
-            time.sleep(self.power * 0.1)
-            counter = len(promise_queue)
-            while len(promise_queue) > 0:
-                job = promise_queue.pop()
-                status = job.status()
-                counter -= 1
-                if status == JobStatus.ERROR:
-                    raise RuntimeError("Job failed.")
-                elif status == JobStatus.CANCELLED:
-                    raise RuntimeError("Job cancelled.")
-                elif status == JobStatus.DONE:
-                    logging.warning(f'Remaining jobs:{len(promise_queue)}')
-                    counter = len(promise_queue)
-                else:
-                    promise_queue.append(job)
-                    if counter == 0:
-                        counter = len(promise_queue)
-                        logging.warning('Waiting time: {:.2f} hours'.format((datetime.now() - start).seconds / 3600.0))
-                        time.sleep(60 * 15)
-            logging.warning('Queue cleared; total time: {:.2f} hours'.format((datetime.now() - start).seconds / 3600.0))
-            for i in range(self.power):
-                self.pos_inner_product_real[i] = eval_promise(pr[i])
-                self.pos_inner_product_imag[i] = -eval_promise(pi[i])
-                self.neg_inner_product_real[i] = eval_promise(nr[i])
-                self.neg_inner_product_imag[i] = -eval_promise(ni[i])
+                b_hash = get_b_hash(self.b)
+                circuits = template.get_circuits(q_pows, imag=False) + template.get_circuits(q_pows, imag=True)
+                keys = [JobLedger.get_key(b_hash, q_pow, imag, self.shots, self.backend)
+                        for imag in [False, True] for q_pow in q_pows]
+                outputs = eval_batch_counts(self.ledger.run(scheduler, self.backend, circuits, keys, self.shots,
+                                                            template.max_circuits))
+            logger.warning('Queue cleared; total time: {:.2f} hours'.format(
+                (datetime.now() - start_time).seconds / 3600.0))
+            # The results are ordered as the real parts of all powers followed by the imaginary parts
+            num = len(pos_pows)
+            real = outputs[:len(q_pows)]
+            imag = -outputs[len(q_pows):]
+            self.pos_inner_product_real[start:] = real[:num]
+            self.pos_inner_product_imag[start:] = imag[:num]
+            # Shot-noise variance of the Hadamard test estimator p0 - p1
+            self.variance_real[start:] = (1 - self.pos_inner_product_real[start:] ** 2) / self.shots
+            self.variance_imag[start:] = (1 - self.pos_inner_product_imag[start:] ** 2) / self.shots
+            if with_neg:
+                self.neg_inner_product_real[start:] = real[num:]
+                self.neg_inner_product_imag[start:] = imag[num:]
+        self._apply_symmetry(start)
+
+    def _get_U_b(self) -> Tuple[Operation, int]:
+        r"""Get the gate preparing b and its number of qubits.
+
+        Returns:
+            Tuple[Operation, int]: the gate and its width
+        """
+        if isinstance(self.b, np.ndarray):
+            width = int(np.log2(self.b.size))
+            q_b = QuantumRegister(width, 'q')
+            q_b_cir = QuantumCircuit(q_b)
+            return q_b_cir.prepare_state(state=Statevector(self.b)).instructions[0], width
+        U_b = self.b.to_gate()
+        return U_b, U_b.num_qubits
+
+    def _get_template(self) -> HadamardTestTemplate:
+        r"""Get the transpiled template of the Hadamard tests, built at the first use for b and the backend.
+
+        The templates are memoized by the hash of b and the name of the backend, so that other instances with the
+        same b, e.g. for other circulant matrices, do not transpile the circuits again.
+
+        Returns:
+            HadamardTestTemplate: the template
+        """
+        key = (get_b_hash(self.b), get_backend_name(self.backend))
+        if key in _TEMPLATE_CACHE:
+            _TEMPLATE_CACHE.move_to_end(key)
+            return _TEMPLATE_CACHE[key]
+        template = HadamardTestTemplate(*self._get_U_b(), self.backend)
+        _TEMPLATE_CACHE[key] = template
+        if len(_TEMPLATE_CACHE) > _TEMPLATE_CACHE_SIZE:
+            _TEMPLATE_CACHE.popitem(last=False)
+        return template
+
+    def get_shot_counts(self) -> np.ndarray:
+        r"""Get the numbers of measurements behind the recorded estimations.
+
+        The rows are the real and imaginary parts of the positive powers, then of the negative powers, in the order
+        of the circuits of the Hadamard tests. If the symmetry option is "derive" or "pool", the negative powers are
+        not estimated on their own, and the rows of the positive powers count the measurements of both.
+
+        Returns:
+            np.ndarray: integer array of shape (4, power)
+        """
+        rows = {"none": [1, 1, 1, 1], "derive": [1, 1, 0, 0], "pool": [2, 2, 0, 0]}[self.symmetry]
+        counts = np.outer(rows, np.full(self.power, self.shots, dtype=np.int64))
+        extra = self._extra_shots[:, :self.power]
+        counts[:, :extra.shape[1]] += extra
+        return counts
+
+    def refine(self, extra_shots: np.ndarray):
+        r"""Refine the estimations of the Hadamard tests with more measurements.
+
+        The new measurements of each circuit are pooled with the recorded ones, weighted by their numbers, and the
+        variances are updated accordingly; circuits without new measurements are kept as they are. If the symmetry
+        option is "derive" or "pool", the measurements of a negative power are taken on the circuit of the positive
+        power, whose estimation is equivalent. The refined estimations are not stored in the cache: the powers
+        calculated by a later extension are only appended to the cached table with the base number of shots.
+
+        Args:
+            extra_shots (np.ndarray): the numbers of new measurements, of shape (4, power) with the rows ordered as
+                                      in ``get_shot_counts``
+        """
+        if self.access != "emulated-shots" and (self.access in self.non_q or self.fourier):
+            raise NotImplementedError(f"access {self.access} cannot be refined with more measurements")
+        extra = np.array(extra_shots, dtype=np.int64).reshape(4, self.power)
+        if np.any(extra < 0):
+            raise ValueError("the numbers of measurements must be nonnegative")
+        if self.symmetry != "none":
+            extra[:2] += extra[2:]
+            extra[2:] = 0
+        counts = self.get_shot_counts()
+        estimations = np.stack([getattr(self, name) for name in self._RECORDS[:4]])
+        if self.access == "emulated-shots":
+            new = np.stack(emulated_inner_products(get_vector_b(self.b), self.power, extra, 0, True, self.rng,
+                                                   self.readout_error))
+        else:
+            new = self.__run_hadamard_tests(extra)
+        refined = extra > 0
+        estimations[refined] = ((counts * estimations + extra * new)[refined]) / (counts + extra)[refined]
+        self._extra_shots = np.pad(self._extra_shots, ((0, 0), (0, max(self.power - self._extra_shots.shape[1], 0))))
+        self._extra_shots[:, :self.power] += extra
+        # Read-only records, e.g. in shared memory, are copied before they are written
+        self._resize(self.power, copy=True)
+        for name, values in zip(self._RECORDS[:4], estimations):
+            getattr(self, name)[:] = values
+        # Shot-noise variance of the Hadamard test estimator p0 - p1
+        counts = self.get_shot_counts()
+        self.variance_real[:] = (1 - self.pos_inner_product_real ** 2) / counts[0]
+        self.variance_imag[:] = (1 - self.pos_inner_product_imag ** 2) / counts[1]
+        if self.symmetry != "none":
+            self.neg_inner_product_real[:] = self.pos_inner_product_real
+            self.neg_inner_product_imag[:] = -self.pos_inner_product_imag
+
+    def __run_hadamard_tests(self, shots: np.ndarray) -> np.ndarray:
+        r"""Run the Hadamard tests with different numbers of measurements per circuit on the Qiskit backend.
+
+        The circuits with the same number of measurements and the same part are submitted together.
+
+        Args:
+            shots (np.ndarray): the numbers of measurements, of shape (4, power) with the rows ordered as
+                                in ``get_shot_counts``
+
+        Returns:
+            np.ndarray: the estimations of shape (4, power); NaN for the circuits without measurements
+        """
+        template = self._get_template()
+        scheduler = get_scheduler() if self.scheduler is None else self.scheduler
+        rows, cols = np.nonzero(shots)
+        q_pows = np.where(rows < 2, cols + 1, -(cols + 1))
+        futures = []
+        groups = []
+        for num in np.unique(shots[rows, cols]):
+            for imag in [False, True]:
+                group = np.flatnonzero((shots[rows, cols] == num) & (rows % 2 == imag))
+                circuits = template.get_circuits(q_pows[group].tolist(), imag)
+                max_circuits = template.max_circuits or max(len(circuits), 1)
+                futures.extend(scheduler.submit(self.backend, circuits[i:i + max_circuits], int(num))
+                               for i in range(0, len(circuits), max_circuits))
+                groups.append(group)
+        outputs = eval_batch_results(scheduler.gather(futures))
+        estimations = np.full(shots.shape, np.nan)
+        order = np.concatenate(groups) if groups else np.empty(0, dtype=np.int64)
+        # The imaginary parts are estimated with the opposite sign
+        estimations[rows[order], cols[order]] = outputs * np.where(rows[order] % 2 == 1, -1, 1)
+        return estimations
+
+    def _apply_symmetry(self, start: int = 0):
+        r"""Use the conjugate symmetry of the inner products according to the symmetry option.
+
+        If the option is "derive", the negative powers are set to the conjugates of the positive ones;
+        If the option is "pool", both are replaced by the average of the two conjugate-symmetric estimates;
+        Else, the independent estimates are kept.
+
+        Args:
+            start (int, optional): only the powers larger than ``start`` are processed
+        """
+        if self.symmetry == "pool":
+            self.pos_inner_product_real[start:] = (self.pos_inner_product_real[start:]
+                                                   + self.neg_inner_product_real[start:]) / 2
+            self.pos_inner_product_imag[start:] = (self.pos_inner_product_imag[start:]
+                                                   - self.neg_inner_product_imag[start:]) / 2
+            self.variance_real[start:] /= 2
+            self.variance_imag[start:] /= 2
+        if self.symmetry in ["derive", "pool"]:
+            self.neg_inner_product_real[start:] = self.pos_inner_product_real[start:]
+            self.neg_inner_product_imag[start:] = -self.pos_inner_product_imag[start:]
 
 
 # Test
 if __name__ == "__main__":
     print(InnerProduct("true", np.array([1, 1j, -1, -1j]) / 2, 1, 2, 1024).pos_inner_product_imag)
+    print(InnerProduct("fft", np.array([1, 1j, -1, -1j]) / 2, 1, 2, 1024).pos_inner_product_imag)
     print(InnerProduct("sample", np.array([1, 1j, -1, -1j]) / 2, 1, 2, 1024).pos_inner_product_imag)
     print(InnerProduct("qiskit-aer", np.array([1, 1j, -1, -1j]) / 2, 1, 2, 1024).pos_inner_product_imag)
+    print(InnerProduct("fourier-qiskit-aer", np.array([1, 1j, -1, -1j]) / 2, 1, 2, 1024).pos_inner_product_imag)
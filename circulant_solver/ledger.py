@@ -0,0 +1,220 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import Future
+from typing import List, Dict, Optional, Union
+from qiskit import QuantumCircuit
+from qiskit.providers import Backend
+from circulant_solver.scheduler import JobScheduler
+from circulant_solver.util import get_backend_name
+
+__all__ = [
+    "JobLedger"
+]
+
+logger = logging.getLogger(__name__)
+
+
+def _retrieve_job(backend: Backend, job_id: str):
+    r"""Retrieve a job submitted before from the backend or its provider.
+
+    Args:
+        backend (Backend): the backend of the job
+        job_id (str): the ID of the job
+
+    Returns:
+        Optional[JobV1]: the job; None if it cannot be retrieved
+    """
+    sources = [backend]
+    provider = getattr(backend, "provider", None)
+    sources.append(provider() if callable(provider) else provider)
+    for source in sources:
+        if source is not None and hasattr(source, "retrieve_job"):
+            try:
+                return source.retrieve_job(job_id)
+            except Exception as error:
+                logger.warning(f"Job {job_id} cannot be retrieved: {error}")
+    return None
+
+
+class JobLedger:
+    r"""Set the persistent job ledger.
+
+    The ledger records every circuit submitted to a backend in a JSON file, keyed by the hash of b, the power of
+    permutation matrix, the real or imaginary part, the number of shots and the name of the backend. The entry of a
+    circuit holds the ID of its job and its index in the job as soon as the job is submitted, and its measurement
+    counts as soon as the job completes. A run interrupted at any time can therefore be resumed:
+    finished circuits are never submitted again, and pending jobs are reattached instead of being resubmitted.
+
+    Attributes:
+        path (str): the path of the JSON file
+    """
+
+    def __init__(self, path: str):
+        r"""Set the persistent job ledger.
+
+        Args:
+            path (str): the path of the JSON file; the records are loaded if the file exists
+        """
+        self.path = path
+        self.__lock = threading.Lock()
+        self.__entries: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path) as file:
+                self.__entries = json.load(file)
+
+    @staticmethod
+    def get_key(b_hash: str, q_pow: Union[int, str], imag: bool, shots: int, backend: Backend) -> str:
+        r"""Get the key of a circuit.
+
+        Args:
+            b_hash (str): the hash of b, see ``get_b_hash``
+            q_pow (Union[int, str]): the power of permutation matrix, or the name of another kind of circuit
+            imag (bool): False: the real part; True: the imaginary part
+            shots (int): number of measurements
+            backend (Backend): the backend supported on Qiskit
+
+        Returns:
+            str: the key of the circuit
+        """
+        return f"{b_hash}|{q_pow}|{int(imag)}|{shots}|{get_backend_name(backend)}"
+
+    def get_counts(self, key: str) -> Optional[Dict[str, int]]:
+        r"""Get the recorded measurement counts of a circuit.
+
+        Args:
+            key (str): the key of the circuit
+
+        Returns:
+            Optional[Dict[str, int]]: the measurement counts; None if the circuit is not finished
+        """
+        with self.__lock:
+            return self.__entries.get(key, {}).get("counts")
+
+    def run(self, scheduler: JobScheduler, backend: Backend, circuits: List[QuantumCircuit], keys: List[str],
+            shots: int = 1024, max_circuits: Optional[int] = None) -> List[Dict[str, int]]:
+        r"""Get the measurement counts of circuits, reusing the finished ones and reattaching the pending ones.
+
+        Args:
+            scheduler (JobScheduler): the scheduler of the jobs
+            backend (Backend): the backend supported on Qiskit
+            circuits (List[QuantumCircuit]): transpiled circuits
+            keys (List[str]): the keys of the circuits, see ``get_key``
+            shots (int, optional): number of measurements
+            max_circuits (int, optional): maximal number of circuits per job
+
+        Returns:
+            List[Dict[str, int]]: the measurement counts of the circuits, in order
+        """
+        with self.__lock:
+            entries = {key: dict(self.__entries.get(key, {})) for key in keys}
+        circuit_of = dict(zip(keys, circuits))
+        pending: Dict[str, List[str]] = {}
+        missing = []
+        for key, circuit in zip(keys, circuits):
+            entry = entries[key]
+            if "counts" in entry:
+                continue
+            if "job_id" in entry:
+                pending.setdefault(entry["job_id"], []).append(key)
+            else:
+                missing.append((key, circuit))
+        futures: List[Future] = []
+        for job_id, job_keys in pending.items():
+            job = _retrieve_job(backend, job_id)
+            if job is None:
+                missing.extend((key, circuit_of[key]) for key in job_keys)
+                continue
+            logger.warning(f"Reattach job {job_id}")
+            indices = [entries[key]["index"] for key in job_keys]
+            futures.append(self.__watch(scheduler.attach(backend, job), job_keys, indices))
+        if missing:
+            max_circuits = max_circuits or len(missing)
+            for i in range(0, len(missing), max_circuits):
+                batch_keys = [key for key, _ in missing[i:i + max_circuits]]
+                batch = [circuit for _, circuit in missing[i:i + max_circuits]]
+                future = scheduler.submit(backend, batch, shots,
+                                          on_submit=lambda job, batch_keys=batch_keys: self.__record_job(job,
+                                                                                                        batch_keys))
+                futures.append(self.__watch(future, batch_keys, list(range(len(batch_keys)))))
+        scheduler.gather(futures)
+        with self.__lock:
+            return [self.__entries[key]["counts"] for key in keys]
+
+    def __watch(self, future: Future, keys: List[str], indices: List[int]) -> Future:
+        r"""Record the measurement counts of the circuits of a job as soon as it completes.
+
+        Args:
+            future (Future): the future of the result of the job
+            keys (List[str]): the keys of the circuits
+            indices (List[int]): the indices of the circuits in the job
+
+        Returns:
+            Future: the future resolved once the counts are recorded
+        """
+        recorded = Future()
+
+        def record_counts(done: Future):
+            if done.exception() is not None:
+                recorded.set_exception(done.exception())
+                return
+            counts = done.result().get_counts()
+            if isinstance(counts, dict):
+                counts = [counts]
+            with self.__lock:
+                for key, index in zip(keys, indices):
+                    self.__entries[key] = {"counts": {k: int(v) for k, v in counts[index].items()}}
+                self.__save()
+            recorded.set_result(done.result())
+        future.add_done_callback(record_counts)
+        return recorded
+
+    def __record_job(self, job, keys: List[str]):
+        r"""Record the ID of a submitted job.
+
+        Args:
+            job (JobV1): the submitted job
+            keys (List[str]): the keys of the circuits of the job, in order
+        """
+        with self.__lock:
+            for index, key in enumerate(keys):
+                self.__entries[key] = {"job_id": job.job_id(), "index": index}
+            self.__save()
+
+    def __save(self):
+        r"""Write the records atomically to the JSON file."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        handle, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(handle, "w") as file:
+            json.dump(self.__entries, file)
+        os.replace(temp_path, self.path)
+
+
+# Test
+if __name__ == "__main__":
+    import numpy as np
+    from qiskit import Aer
+    from circulant_solver.util import FakeQueueBackend
+    from circulant_solver.inner_product import InnerProduct
+    path = os.path.join(tempfile.mkdtemp(), "ledger.json")
+    backend = FakeQueueBackend(Aer.get_backend('aer_simulator_statevector'), latency=1.0)
+    scheduler = JobScheduler(initial_wait=0.2)
+    vec_b = np.array([1, 1j, -1, -1j, 1, 1, 1, 1]) / np.sqrt(8)
+    ip = InnerProduct("fake-queue", vec_b, 1, 2, 1024, scheduler=scheduler, ledger=JobLedger(path))
+    # A rerun reuses all the recorded counts without any submission
+    submitted = len(FakeQueueBackend._JOBS)
+    rerun = InnerProduct("fake-queue", vec_b, 1, 2, 1024, scheduler=scheduler, ledger=JobLedger(path))
+    print(len(FakeQueueBackend._JOBS) - submitted, np.allclose(ip.pos_inner_product_real, rerun.pos_inner_product_real))
+    # A run interrupted after the submission reattaches the pending job
+    ledger = JobLedger(path)
+    keys = [JobLedger.get_key("crash", q_pow, False, 1024, backend) for q_pow in range(2)]
+    circuit = QuantumCircuit(1, 1)
+    circuit.x(0)
+    circuit.measure(0, 0)
+    job = backend.run([circuit, circuit], shots=1024)
+    ledger._JobLedger__record_job(job, keys)
+    submitted = len(FakeQueueBackend._JOBS)
+    print(JobLedger(path).run(scheduler, backend, [circuit, circuit], keys), len(FakeQueueBackend._JOBS) - submitted)
+    scheduler.close()
@@ -1,20 +1,75 @@
 import numpy as np
-import sys
+import os
 from circulant_solver.circulant import Circulant
-from qiskit import QuantumCircuit, Aer, execute
+from circulant_solver.state import get_vector_b, get_b_hash
+from circulant_solver.metrics import get_metrics
+from circulant_solver.solution import reconstruct_solution
+from circulant_solver.toeplitz import Toeplitz
+from qiskit import QuantumCircuit
+from typing import Dict, List
 import json
 
 __all__ = [
-    "log"
+    "log",
+    "load_log"
 ]
 
 
+def _append_arrays(path: str, arrays: Dict[str, np.ndarray]) -> Dict[str, Dict]:
+    r"""Append arrays in binary to the sidecar file.
+
+    Args:
+        path (str): the path of the sidecar file
+        arrays (Dict[str, np.ndarray]): the arrays to append
+
+    Returns:
+        Dict[str, Dict]: the offset, data type and shape of each array in the sidecar file
+    """
+    entries = {}
+    with open(path, "ab") as file:
+        # The position of a file opened for appending is at its end
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            entries[name] = {"offset": file.tell(), "dtype": array.dtype.str, "shape": list(array.shape)}
+            file.write(array.tobytes())
+    return entries
+
+
+def _write_b(U_b, log_file: str) -> str:
+    r"""Write the description of b once per log file, named by its hash.
+
+    Args:
+        U_b (QuantumCircuit / np.ndarray / Tuple[Dict[int, complex], int]): the description of vector b
+        log_file (str): name of the recording file
+
+    Returns:
+        str: the hash of b
+    """
+    b_hash = get_b_hash(U_b)
+    if isinstance(U_b, QuantumCircuit):
+        path = f"{log_file}.b_{b_hash[:16]}.tex"
+        if not os.path.exists(path):
+            with open(path, "w") as fp:
+                fp.write(str(U_b.draw("latex_source")))
+    else:
+        path = f"{log_file}.b_{b_hash[:16]}.npy"
+        if not os.path.exists(path):
+            np.save(path, get_vector_b(U_b))
+    return b_hash
+
+
 def log(C: Circulant, U_b, W: np.ndarray, r: np.ndarray, threshold: int, alpha, loss, access: str, shots: int,
         log_file):
     r"""We design a log function to record details and data in our experiments.
 
-    All the experimental details and data are recorded in a '.json' file and a '.txt' file.
-    Users can browse our original historical data of different experiments in these recoding files
+    Every call appends one threshold of an experiment to the store of ``log_file``, which consists of:
+
+        '.jsonl': one JSON object per line with the scalar data, and the location of the arrays in the sidecar;
+        '.bin': the binary sidecar with the arrays W, r, alpha, x and the coefficients of C;
+        '.b_<hash>.tex' / '.b_<hash>.npy': the LaTeX source of the circuit of b or the vector b,
+        written only once for each b.
+
+    Each call only writes the new data, and the store is read back by ``load_log``.
 
     Args:
         C (Circulant): circulant matrix class
@@ -26,55 +81,61 @@ def log(C: Circulant, U_b, W: np.ndarray, r: np.ndarray, threshold: int, alpha,
         loss (float / np.ndarray): loss
         access (str): different access to the backend
         shots (int): number of measurements
-        log_file (str): name of the recoding file
+        log_file (str): name of the recording file
     """
-    np.set_printoptions(threshold=sys.maxsize)
-    if isinstance(U_b, QuantumCircuit):
-        sim = Aer.get_backend('unitary_simulator')
-        job = execute(U_b, sim)
-        result = job.result()
-        mat = result.get_unitary(U_b, decimals=16)
-        vec_b = np.transpose(mat)[0]
-        repr_b = str(U_b.draw("latex_source"))
-    elif isinstance(U_b, np.ndarray):
-        vec_b = U_b
-        repr_b = str(vec_b)
-    else:
-        raise NotImplementedError
-    dim = vec_b.size
-    c_coeff = dict(zip(C.get_pows(), C.get_coeffs()))
-    c_mat = C.get_matrix(dim)
-    b_shift = np.zeros((2 * threshold + 1, dim), dtype=np.complex128)
-    for idx, q_pow in enumerate(range(-threshold, threshold + 1)):
-        b_shift[idx] = np.roll(vec_b, q_pow)
+    b_hash = _write_b(U_b, log_file)
+    vec_b = get_vector_b(U_b)
     alpha = np.array(alpha)
-    x = np.matmul(alpha, b_shift)
-    kappa = np.linalg.cond(c_mat)
-    with open(log_file + ".txt", 'a') as fp:
-        fp.write(f"{c_coeff}-{threshold}\n\n")
-        fp.write(f"C_coeff\n{c_coeff}\n\n")
-        fp.write(f"U_b\n{repr_b}\n\n")
-        fp.write(f"W\n{str(W)}\n\n")
-        fp.write(f"r\n{str(r)}\n\n")
-        fp.write(f"Threshold T\n{threshold}\n\n")
-        fp.write(f"alpha\n{str(alpha)}\n\n")
-        fp.write(f"x\n{str(x)}\n\n")
-        fp.write(f"kappa\n{kappa}\n\n")
-        fp.write(f"loss\n{loss}\n\n")
-        fp.write(f"access\n{access}\n\n")
-        fp.write(f"shots \n{shots}\n\n")
+    x = reconstruct_solution(vec_b, alpha, threshold)
+    metrics = get_metrics(C, vec_b, alpha, threshold)
+    arrays = {"C_coeffs": np.asarray(C.get_coeffs()), "r": r, "alpha": alpha, "x": x}
+    # The Toeplitz form of W is determined by its generating sequence
+    if isinstance(W, Toeplitz):
+        arrays["W_sequence"] = W.get_sequence()
+    else:
+        arrays["W"] = W
     output = {}
-    output["C_coeff"] = c_coeff
-    output["U_b"] = repr_b
-    output["W"] = str(W)
-    output["r"] = str(r)
-    output["threshold"] = threshold
-    output["alpha"] = str(alpha)
-    output["x"] = str(x)
-    output["kappa"] = kappa
-    output["loss"] = loss
+    output["C_pows"] = [int(p) for p in C.get_pows()]
+    output["b_hash"] = b_hash
+    output["threshold"] = int(threshold)
+    output["kappa"] = metrics["kappa"]
+    output["residual"] = metrics["residual"]
+    output["error"] = metrics["error"]
+    output["loss"] = float(np.real(loss))
     output["access"] = access
-    output["shots"] = shots
-    out_file = open(log_file + ".json", "a")
-    json.dump(output, out_file, indent=6)
-    out_file.close()
+    output["shots"] = int(shots)
+    output["arrays"] = _append_arrays(log_file + ".bin", arrays)
+    with open(log_file + ".jsonl", "a") as fp:
+        fp.write(json.dumps(output) + "\n")
+
+
+def load_log(log_file, mmap: bool = True) -> List[Dict]:
+    r"""Load the records written by ``log``.
+
+    Args:
+        log_file (str): name of the recording file
+        mmap (bool, optional): whether to map the arrays from the sidecar file instead of reading them into memory
+
+    Returns:
+        List[Dict]: one dictionary per record in the order of writing, with the arrays in place of their locations
+    """
+    records = []
+    if not os.path.exists(log_file + ".jsonl"):
+        return records
+    data = None
+    if os.path.getsize(log_file + ".bin") > 0:
+        data = np.memmap(log_file + ".bin", dtype=np.uint8, mode="r") if mmap else np.fromfile(log_file + ".bin",
+                                                                                                dtype=np.uint8)
+    with open(log_file + ".jsonl") as fp:
+        for line in fp:
+            record = json.loads(line)
+            for name, entry in record.pop("arrays").items():
+                dtype = np.dtype(entry["dtype"])
+                count = int(np.prod(entry["shape"]))
+                if count == 0:
+                    record[name] = np.empty(entry["shape"], dtype=dtype)
+                else:
+                    record[name] = np.frombuffer(data, dtype=dtype, count=count,
+                                                 offset=entry["offset"]).reshape(entry["shape"])
+            records.append(record)
+    return records
@@ -0,0 +1,99 @@
+import numpy as np
+from scipy.linalg import solveh_banded
+from typing import Dict, List, Optional
+from circulant_solver.circulant import Circulant
+
+__all__ = [
+    "get_metrics",
+    "predict_threshold"
+]
+
+
+def get_metrics(C: Circulant, vec_b: np.ndarray, alpha: List, threshold: int) -> Dict[str, float]:
+    r"""Evaluate the solution of the Ansatz against the linear system, without forming any dense matrix.
+
+    The solution :math:`x = \sum_{t=-T}^{T} \alpha_t Q^t b` is the cyclic convolution of b with the kernel
+    :math:`a = \sum_t \alpha_t e_t`, so in the Fourier basis :math:`\hat{x} = \hat{a} \hat{b}`, and
+    :math:`\widehat{Cx} = \lambda \hat{a} \hat{b}` with the eigenvalues :math:`\lambda` of C. By Parseval's identity,
+    all the norms below are evaluated in the Fourier basis, at the cost of a few FFTs.
+
+    Args:
+        C (Circulant): circulant matrix class
+        vec_b (np.ndarray): the vector b
+        alpha (List): the optimal combination parameters of the powers from -threshold to threshold
+        threshold (int): truncation threshold of our algorithm
+
+    Returns:
+        Dict[str, float]: the condition number "kappa" of C, the relative residual "residual"
+        :math:`\|Cx - b\| / \|b\|`, and the relative error "error" :math:`\|x - C^{-1} b\| / \|C^{-1} b\|`
+    """
+    dim = vec_b.size
+    eig = C.eigenvalues(dim)
+    kernel = np.zeros(dim, dtype=np.complex128)
+    np.add.at(kernel, np.mod(np.arange(-threshold, threshold + 1), dim), np.asarray(alpha, dtype=np.complex128))
+    b_hat = np.fft.fft(vec_b)
+    x_hat = np.fft.fft(kernel) * b_hat
+    metrics = {"kappa": C.condition_number(dim),
+               "residual": float(np.linalg.norm(eig * x_hat - b_hat) / np.linalg.norm(b_hat)),
+               "error": np.nan}
+    if np.all(eig != 0):
+        exact_hat = b_hat / eig
+        metrics["error"] = float(np.linalg.norm(x_hat - exact_hat) / np.linalg.norm(exact_hat))
+    return metrics
+
+
+def predict_threshold(C: Circulant, dim: int, tol: float = 0.01) -> Optional[int]:
+    r"""Predict the truncation threshold from the spectrum of C.
+
+    For a vector b with a flat spectrum, such as :math:`|0\rangle`, the loss of threshold T is the weighted
+    approximation error :math:`\frac{1}{N} \sum_\omega |\lambda(\omega) p(\omega) - 1|^2` of the best trigonometric
+    polynomial p of degree T, which only depends on the spectrum of C: the inner products vanish except for the
+    power 0, so V is the banded Toeplitz matrix of the autocorrelation of the coefficients of C, and q is supported
+    on the powers of C. The loss of each threshold is obtained by a banded Cholesky solve, and since it decreases
+    with the threshold, the smallest threshold with loss below ``tol`` is found by galloping and bisection.
+
+    Args:
+        C (Circulant): circulant matrix class
+        dim (int): dimension
+        tol (float, optional): the bound of the loss
+
+    Returns:
+        Optional[int]: the predicted threshold; None if C is singular
+    """
+    if not np.isfinite(C.condition_number(dim)):
+        return None
+    coeffs = np.asarray(C.get_coeffs(), dtype=np.complex128)
+    pows = np.asarray(C.get_pows(), dtype=np.int64)
+    # V[t_1, t_2] = sum of conj(c_{k_1}) c_{k_2} over P_{k_1} - P_{k_2} = t_2 - t_1
+    band = int(np.max(pows, initial=0) - np.min(pows, initial=0))
+    autocorrelation = np.zeros(2 * band + 1, dtype=np.complex128)
+    np.add.at(autocorrelation, (pows[:, np.newaxis] - pows[np.newaxis, :] + band).reshape(-1),
+              (np.conj(coeffs)[:, np.newaxis] * coeffs[np.newaxis, :]).reshape(-1))
+
+    def get_loss(threshold: int) -> float:
+        size = 2 * threshold + 1
+        width = min(band, size - 1)
+        # Upper banded storage: row width - d holds the entries V[t, t + d]
+        ab = np.zeros((width + 1, size), dtype=np.complex128)
+        for d in range(width + 1):
+            ab[width - d, d:] = autocorrelation[band + d]
+        q = np.zeros(size, dtype=np.complex128)
+        inside = np.abs(pows) <= threshold
+        np.add.at(q, threshold - pows[inside], np.conj(coeffs[inside]))
+        y = solveh_banded(ab, q)
+        return abs(1 - np.real(np.vdot(q, y)))
+
+    # Powers beyond half of the dimension wrap around and do not enlarge the Ansatz
+    max_threshold = dim // 2
+    lo, hi = -1, 0
+    while get_loss(hi) >= tol:
+        if hi >= max_threshold:
+            return max_threshold
+        lo, hi = hi, min(2 * hi + 1, max_threshold)
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if get_loss(mid) < tol:
+            hi = mid
+        else:
+            lo = mid
+    return hi
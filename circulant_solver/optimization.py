@@ -1,17 +1,280 @@
 # !/usr/bin/env python3
 import numpy as np
-from cvxopt import matrix
-from cvxopt.solvers import qp
-from typing import List, Tuple
+from scipy.linalg import solve_toeplitz, solve_triangular, matmul_toeplitz
+from scipy.linalg.lapack import zpstrf
+from typing import List, Tuple, Union, Optional
+from circulant_solver.toeplitz import Toeplitz
+from circulant_solver.circulant import Circulant
+from circulant_solver.inner_product import InnerProduct
 
 __all__ = [
-    "solve_combination_parameters"
+    "IncrementalSolver",
+    "solve_combination_parameters",
+    "solve_combination_parameters_direct",
+    "solve_combination_parameters_batch",
+    "solve_combination_parameters_toeplitz",
+    "solve_combination_parameters_cvxopt"
 ]
 
 
-def solve_combination_parameters(W: np.ndarray, r: np.ndarray) -> Tuple[float, List]:
+def solve_combination_parameters(W: Union[np.ndarray, Toeplitz], r: np.ndarray,
+                                 solver: str = "direct") -> Tuple[float, List]:
     r"""Optimization module for solving the optimal combination parameters.
 
+    The quadratic problem :math:`\min_x x^T W x - 2 r^T x + 1` has no constraints, so its optimum is the
+    solution of a single Hermitian positive-semidefinite linear system. The solver can be selected by name:
+
+        "direct": pivoted Cholesky factorization of the complex system, which leaves out the dependent vectors;
+        "toeplitz": Levinson recursion for W in the structured Toeplitz form;
+        "cvxopt": the interior-point quadratic solver of CVXOPT on the real embedding.
+
+    If W is given in the structured Toeplitz form, the "direct" solver uses the Levinson recursion as well.
+
+    Args:
+        W (Union[np.ndarray, Toeplitz]): the auxiliary matrix W
+        r (np.ndarray): the auxiliary vector r
+        solver (str, optional): name of the solver
+
+    Returns:
+        Tuple[float, List]: loss and the optimal combination parameters
+    """
+    if solver == "cvxopt":
+        if isinstance(W, Toeplitz):
+            W = W.get_real_matrix()
+        return solve_combination_parameters_cvxopt(W, r)
+    elif solver == "direct" or solver == "toeplitz":
+        if isinstance(W, Toeplitz):
+            return solve_combination_parameters_toeplitz(W, r)
+        elif solver == "toeplitz":
+            raise ValueError("the toeplitz solver requires W in the structured Toeplitz form")
+        return solve_combination_parameters_direct(W, r)
+    else:
+        raise NotImplementedError(f"unknown solver {solver}")
+
+
+def _get_complex_system(W: np.ndarray, r: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    r"""Get the complex system :math:`V \alpha = q` from the real embedding W and r.
+
+    The quadratic form of the real embedding only depends on the Hermitian part of V,
+    which is returned instead of V itself.
+
+    Args:
+        W (np.ndarray): the auxiliary matrix W
+        r (np.ndarray): the auxiliary vector r
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: the Hermitian part of V and the vector q
+    """
+    T = W.shape[0] // 2
+    V = W[:T, :T] + 1j * W[T:, :T]
+    V = (V + np.conj(V.T)) / 2
+    r = np.asarray(r, dtype=np.float64).reshape(-1)
+    q = r[:T] + 1j * r[T:]
+    return V, q
+
+
+def _solve_cholesky_stack(L: np.ndarray, q: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    r"""Solve the stacked systems :math:`L L^\dagger \alpha = q` by forward and backward substitution.
+
+    The substitutions loop over the T rows, with each step vectorized over the stacked systems.
+
+    Args:
+        L (np.ndarray): the stacked lower triangular Cholesky factors, with the systems along the first axis
+        q (np.ndarray): the stacked right-hand sides, one row per system
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: the vectors :math:`y = L^{-1} q` and the solutions :math:`\alpha`
+    """
+    T = q.shape[1]
+    y = np.empty_like(q)
+    for i in range(T):
+        y[:, i] = (q[:, i] - np.sum(L[:, i, :i] * y[:, :i], axis=1)) / L[:, i, i]
+    alpha = np.empty_like(q)
+    for i in range(T - 1, -1, -1):
+        alpha[:, i] = (y[:, i] - np.sum(np.conj(L[:, i + 1:, i]) * alpha[:, i + 1:], axis=1)) / np.conj(L[:, i, i])
+    return y, alpha
+
+
+def _pivoted_cholesky(V: np.ndarray, q: np.ndarray, rcond: float) -> Tuple[np.ndarray, np.ndarray, List[int]]:
+    r"""Factorize the most independent Ansatz vectors by the pivoted Cholesky factorization of V.
+
+    At each step, the vector with the largest relative pivot, i.e. the largest squared distance to the span of the
+    accepted ones compared to its diagonal entry of V, is accepted, until all the remaining ones are below
+    ``rcond``. The other vectors are numerically in the span of the accepted ones, and are left out of the Ansatz.
+    After scaling V to a unit diagonal, this is the pivoted Cholesky factorization ``?pstrf`` of LAPACK.
+
+    Args:
+        V (np.ndarray): the Hermitian matrix V
+        q (np.ndarray): the vector q
+        rcond (float): relative cutoff of the pivots
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, List[int]]: the Cholesky factor of the accepted vectors in the order of
+        acceptance, the vector :math:`y = L^{-1} q` and the indices of the accepted vectors
+    """
+    diag = np.real(np.diag(V))
+    # The vectors with a zero diagonal entry are zero, and their pivots stay zero
+    scale = np.sqrt(np.where(diag > 0, diag, 1))
+    factor, piv, rank, info = zpstrf(V / np.outer(scale, scale), tol=rcond, lower=1)
+    if info < 0:
+        raise ValueError(f"illegal argument {-info} of zpstrf")
+    order = [int(j) for j in piv[:rank] - 1]
+    L = scale[order, np.newaxis] * np.tril(factor[:rank, :rank])
+    y = solve_triangular(L, q[order], lower=True, check_finite=False) if rank > 0 else q[:0]
+    return L, y, order
+
+
+def _get_loss(V: np.ndarray, q: np.ndarray, alpha: np.ndarray) -> float:
+    r"""Evaluate the loss :math:`\alpha^\dagger V \alpha - 2 \mathrm{Re}(q^\dagger \alpha) + 1` at the parameters.
+
+    Unlike :math:`1 - \|y\|^2`, which only holds for the exact optimum, this is the squared residual of the
+    returned parameters, whatever the accuracy of the solve.
+
+    Args:
+        V (np.ndarray): the Hermitian matrix V
+        q (np.ndarray): the vector q
+        alpha (np.ndarray): the combination parameters
+
+    Returns:
+        float: loss
+    """
+    return abs(1 - 2 * np.real(np.vdot(q, alpha)) + np.real(np.vdot(alpha, V @ alpha)))
+
+
+def solve_combination_parameters_direct(W: np.ndarray, r: np.ndarray,
+                                        rcond: Optional[float] = None) -> Tuple[float, List]:
+    r"""Solve the optimal combination parameters by a direct factorization of the complex T x T system.
+
+    With the Cholesky factorization :math:`V = L L^\dagger` and :math:`y = L^{-1} q`, the optimal parameters are
+    :math:`\alpha = L^{-\dagger} y`. For a smooth b, the shifted vectors of the Ansatz are nearly dependent and V is
+    numerically singular, so the pivoted Cholesky factorization is used, which leaves out the vectors that are
+    numerically in the span of the others, as in ``IncrementalSolver``. Since the identity
+    :math:`1 - \|y\|^2` only holds for the exact optimum, the loss is evaluated at the returned parameters.
+
+    Args:
+        W (np.ndarray): the auxiliary matrix W
+        r (np.ndarray): the auxiliary vector r
+        rcond (float, optional): relative cutoff of the pivots, by default the square root of the machine epsilon
+
+    Returns:
+        Tuple[float, List]: loss and the optimal combination parameters
+    """
+    V, q = _get_complex_system(W, r)
+    if rcond is None:
+        rcond = np.sqrt(np.finfo(np.float64).eps)
+    L, y, order = _pivoted_cholesky(V, q, rcond)
+    alpha = np.zeros(q.size, dtype=np.complex128)
+    if order:
+        alpha[order] = solve_triangular(L, y, lower=True, trans='C', check_finite=False)
+    return _get_loss(V, q, alpha), list(alpha)
+
+
+def solve_combination_parameters_batch(W: np.ndarray, r: np.ndarray,
+                                       rcond: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+    r"""Solve the optimal combination parameters of a batch of auxiliary systems with the same size.
+
+    The Cholesky factorizations :math:`V = L L^\dagger` of all systems are computed as one stacked operation, and
+    the systems are solved by stacked triangular solves with L. A system is only solved this way if all its relative
+    pivots are above ``rcond`` and the loss evaluated at the parameters agrees with :math:`1 - \|y\|^2` for
+    :math:`y = L^{-1} q`, i.e. if the factorization is accurate. The other systems, e.g. the numerically singular
+    ones of a smooth b, are solved one by one by the pivoted factorization of ``solve_combination_parameters_direct``.
+
+    Args:
+        W (np.ndarray): the stacked auxiliary matrices W, with the systems along the first axis
+        r (np.ndarray): the stacked auxiliary vectors r
+        rcond (float, optional): relative cutoff of the pivots, by default the square root of the machine epsilon
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: the losses and the optimal combination parameters, one row per system
+    """
+    M = W.shape[0]
+    T = W.shape[1] // 2
+    V = W[:, :T, :T] + 1j * W[:, T:, :T]
+    V = (V + np.conj(np.swapaxes(V, 1, 2))) / 2
+    r = np.asarray(r, dtype=np.float64).reshape(M, -1)
+    q = r[:, :T] + 1j * r[:, T:]
+    if rcond is None:
+        rcond = np.sqrt(np.finfo(np.float64).eps)
+    losses = np.empty(M, dtype=np.float64)
+    alphas = np.empty((M, T), dtype=np.complex128)
+    # A failed factorization of the stack gives no information on the other systems, so each is checked
+    try:
+        L = np.linalg.cholesky(V)
+        pivots = np.abs(np.diagonal(L, axis1=1, axis2=2)) ** 2
+        stable = np.all(pivots > rcond * np.real(np.diagonal(V, axis1=1, axis2=2)), axis=1)
+    except np.linalg.LinAlgError:
+        L = None
+        stable = np.zeros(M, dtype=bool)
+    if L is not None and np.any(stable):
+        y, alpha = _solve_cholesky_stack(L[stable], q[stable])
+        # The loss at the parameters, as in ``_get_loss``, for all the stacked systems
+        loss = np.abs(1 - 2 * np.real(np.sum(np.conj(q[stable]) * alpha, axis=1))
+                      + np.real(np.sum(np.conj(alpha) * (V[stable] @ alpha[:, :, np.newaxis])[:, :, 0], axis=1)))
+        accurate = np.abs(loss - (1 - np.sum(np.abs(y) ** 2, axis=1))) <= rcond
+        alphas[stable] = alpha
+        losses[stable] = loss
+        stable[stable] = accurate
+    for m in np.flatnonzero(~stable):
+        loss, alpha = solve_combination_parameters_direct(W[m], r[m], rcond)
+        losses[m] = loss
+        alphas[m] = alpha
+    return losses, alphas
+
+
+def solve_combination_parameters_toeplitz(W: Toeplitz, r: np.ndarray, rtol: float = 1e-8,
+                                          rcond: Optional[float] = None) -> Tuple[float, List]:
+    r"""Solve the optimal combination parameters for the structured Toeplitz W by Levinson recursion.
+
+    Writing the combination parameters as complex numbers, the optimality condition of the quadratic problem
+    is the Toeplitz linear system :math:`V \alpha = q`, where V is the Hermitian part of the Toeplitz block
+    and :math:`q = q_R + i q_I`. The Levinson recursion solves it in O(T^2) time and O(T) memory,
+    and the loss is evaluated at the parameters by an FFT-based product with V, without forming any matrix.
+    The Levinson recursion is only accurate if V is well conditioned, which is checked as follows, and otherwise
+    it falls back to the pivoted factorization of ``solve_combination_parameters_direct``:
+
+        the relative residual :math:`\|V \alpha - q\| / \|q\|` is at most ``rtol``;
+        the smallest Cholesky pivot of V, which is the one of the last vector for a positive-semidefinite Toeplitz
+        matrix, i.e. :math:`1 / (V^{-1})_{TT}`, is above ``rcond`` times the diagonal, as in the direct solver;
+        the loss at the parameters agrees with the optimal loss :math:`1 - \mathrm{Re}(q^\dagger \alpha)`.
+
+    Args:
+        W (Toeplitz): the auxiliary matrix W in the structured form
+        r (np.ndarray): the auxiliary vector r
+        rtol (float, optional): the largest accepted relative residual of the Levinson solution
+        rcond (float, optional): relative cutoff of the pivots, by default the square root of the machine epsilon
+
+    Returns:
+        Tuple[float, List]: loss and the optimal combination parameters
+    """
+    T = W.get_size()
+    r = np.asarray(r, dtype=np.float64).reshape(-1)
+    q = r[:T] + 1j * r[T:]
+    if rcond is None:
+        rcond = np.sqrt(np.finfo(np.float64).eps)
+    V = W.hermitian_part()
+    c_or_cr = (V.get_column(), V.get_row())
+    last = np.zeros(T, dtype=np.complex128)
+    last[-1] = 1
+    try:
+        alpha = solve_toeplitz(c_or_cr, q, check_finite=False)
+        product = matmul_toeplitz(c_or_cr, alpha, check_finite=False)
+        residual = np.linalg.norm(product - q)
+        with np.errstate(divide="ignore"):
+            pivot = 1 / np.real(solve_toeplitz(c_or_cr, last, check_finite=False)[-1])
+    except np.linalg.LinAlgError:
+        alpha = product = np.full(T, np.nan)
+        residual = pivot = np.nan
+    loss = abs(1 - 2 * np.real(np.vdot(q, alpha)) + np.real(np.vdot(alpha, product)))
+    # The comparisons with NaN fail, so that a non-finite solution falls back as well
+    if not (residual <= rtol * np.linalg.norm(q) and pivot > rcond * np.real(V.get_column()[0])
+            and abs(loss - (1 - np.real(np.vdot(q, alpha)))) <= rcond):
+        return solve_combination_parameters_direct(W.get_real_matrix(), r, rcond)
+    return loss, list(alpha)
+
+
+def solve_combination_parameters_cvxopt(W: np.ndarray, r: np.ndarray) -> Tuple[float, List]:
+    r"""Solve the optimal combination parameters by the quadratic solver of CVXOPT.
+
     In this module, we implement the CVXOPT package as an external resource package.
     CVXOPT is a free software package for convex optimization based on the Python programming language.
     Reference: https://cvxopt.org
@@ -29,6 +292,11 @@ def solve_combination_parameters(W: np.ndarray, r: np.ndarray) -> Tuple[float, L
     Returns:
         Tuple[float, List]: loss and the optimal combination parameters
     """
+    try:
+        from cvxopt import matrix
+        from cvxopt.solvers import qp
+    except ImportError:
+        raise ImportError("Please pip install cvxopt for this option.")
     W = 2 * matrix(W)
     r = (-2) * matrix(r)
     # Solve the optimization problem using the kkt solver with regularization constant of 1e-12
@@ -49,3 +317,267 @@ def solve_combination_parameters(W: np.ndarray, r: np.ndarray) -> Tuple[float, L
     loss = abs(
         (np.transpose(params_array) @ W_array @ params_array - 2 * np.transpose(r_array) @ params_array + 1).item())
     return loss, results
+
+
+class IncrementalSolver:
+    r"""Set the incremental solver over the truncation threshold.
+
+    Going from threshold t to t + 1 adds the two Ansatz vectors :math:`Q^{-(t+1)} b` and :math:`Q^{t+1} b`.
+    Ordering the Ansatz from the center outwards, the Cholesky factor :math:`V_t = L_t L_t^\dagger` of the
+    (Hermitian part of the) complex system is extended to :math:`V_{t+1}` by appending one row per new vector,
+    which costs O(t^2) instead of a new O(t^3) factorization. The vector :math:`y = L^{-1} q` is extended in the
+    same way, and the optimal loss is :math:`1 - \|y\|^2`.
+    The border update is only accurate if the pivot of the new vector, i.e. its squared distance to the span of
+    the previous ones, is not too small compared to its diagonal entry of V, so a new vector whose relative pivot is
+    below ``rcond`` is not appended. As in ``solve_combination_parameters_direct``, the loss is evaluated at the
+    parameters, and whenever a vector is not appended, the loss increases with the threshold or it does not agree
+    with :math:`1 - \|y\|^2`, which can only be caused by roundoff errors, the factorization of all the powers is
+    rebuilt from scratch by the pivoted Cholesky factorization of V, see ``_pivoted_cholesky``.
+    Since the parameters of a threshold remain feasible for the larger ones, the previous factorization is kept
+    instead if the rebuilt one has a larger loss, so that the loss curve never increases.
+
+    Attributes:
+        C (Circulant): circulant matrix class
+        ip (InnerProduct): a list of inner products, extended in place when more powers are required
+        step (int, optional): number of thresholds added to ``ip`` whenever it is extended
+        rcond (float, optional): relative cutoff of the pivots
+    """
+
+    def __init__(self, C: Circulant, ip: InnerProduct, step: int = 20, rcond: Optional[float] = None):
+        r"""Set the incremental solver over the truncation threshold.
+
+        The solver starts with the threshold 0, i.e. the Ansatz consists of b only.
+
+        Args:
+            C (Circulant): circulant matrix class
+            ip (InnerProduct): a list of inner products, extended in place when more powers are required
+            step (int, optional): number of thresholds added to ``ip`` whenever it is extended
+            rcond (float, optional): relative cutoff of the pivots, by default the square root of the machine epsilon
+        """
+        self.__C_coeffs = np.asarray(C.get_coeffs())
+        self.__C_pows = np.asarray(C.get_pows(), dtype=np.int64)
+        self.__coeff_prod = np.conj(self.__C_coeffs)[:, np.newaxis] * self.__C_coeffs[np.newaxis, :]
+        self.__ip = ip
+        self.__step = step
+        self.__rcond = np.sqrt(np.finfo(np.float64).eps) if rcond is None else rcond
+        self.__threshold = -1
+        # Cholesky factor in the order of the accepted Ansatz powers, with geometrically growing capacity
+        self.__L = np.zeros((0, 0), dtype=np.complex128)
+        self.__y = np.zeros(0, dtype=np.complex128)
+        self.__pows = []
+        self.__losses = []
+        self.__table = None
+        self.__add_power(0)
+        self.__threshold = 0
+        self.__loss = self.__evaluate_loss()
+        self.__losses.append(self.__loss)
+
+    def get_threshold(self) -> int:
+        r"""Get the current truncation threshold.
+
+        Returns:
+            int: the current truncation threshold
+        """
+        return self.__threshold
+
+    def grow(self):
+        r"""Increase the truncation threshold by one with a rank-2 border update of the factorization."""
+        t = self.__threshold + 1
+        size = len(self.__pows)
+        previous = (self.__L[:size, :size].copy(), self.__y[:size].copy(), list(self.__pows))
+        accepted = self.__add_power(-t) & self.__add_power(t)
+        self.__threshold = t
+        self.__loss = self.__evaluate_loss()
+        size = len(self.__pows)
+        optimum = 1 - np.real(np.vdot(self.__y[:size], self.__y[:size]))
+        if not accepted or self.__loss > self.__losses[-1] or abs(self.__loss - optimum) > self.__rcond:
+            self.__refactor()
+            self.__loss = self.__evaluate_loss()
+            if self.__loss > self.__losses[-1]:
+                self.__set_factor(*previous)
+                self.__loss = self.__losses[-1]
+        self.__losses.append(self.__loss)
+
+    def loss(self) -> float:
+        r"""Get the loss of the current truncation threshold.
+
+        Returns:
+            float: loss
+        """
+        return self.__loss
+
+    def get_losses(self) -> List[float]:
+        r"""Get the loss curve.
+
+        Returns:
+            List[float]: the losses of the thresholds 0, 1, ..., up to the current threshold
+        """
+        return list(self.__losses)
+
+    def get_alpha(self) -> List:
+        r"""Get the optimal combination parameters of the current truncation threshold.
+
+        Returns:
+            List: the combination parameters of the Ansatz powers from -T to T
+        """
+        alpha = np.zeros(2 * self.__threshold + 1, dtype=np.complex128)
+        alpha[np.array(self.__pows, dtype=np.int64) + self.__threshold] = self.__get_coords()
+        return list(alpha)
+
+    def __get_coords(self) -> np.ndarray:
+        r"""Get the combination parameters of the accepted Ansatz powers.
+
+        Returns:
+            np.ndarray: the parameters in the order of the accepted powers
+        """
+        size = len(self.__pows)
+        return solve_triangular(self.__L[:size, :size], self.__y[:size], lower=True, trans='C', check_finite=False)
+
+    def __evaluate_loss(self) -> float:
+        r"""Evaluate the loss at the combination parameters of the current factorization.
+
+        Returns:
+            float: loss
+        """
+        pows = np.array(self.__pows, dtype=np.int64)
+        table = self.__get_table(2 * (np.max(np.abs(pows)) + np.max(np.abs(self.__C_pows), initial=0)))
+        columns = [self.__get_column(table, pows, p) for p in pows]
+        V = np.stack([col for col, _ in columns], axis=1)
+        q = np.array([q_p for _, q_p in columns])
+        return _get_loss(V, q, self.__get_coords())
+
+    def __get_table(self, max_pow: int) -> np.ndarray:
+        r"""Get the lookup table of inner products, extending ``ip`` if the power is not yet available.
+
+        Args:
+            max_pow (int): the largest absolute power required
+
+        Returns:
+            np.ndarray: the lookup table of ``ip``
+        """
+        if max_pow > self.__ip.power:
+            threshold = max(-(-(max_pow - 2 * self.__ip.term_number) // 2), self.__ip.threshold + self.__step)
+            self.__ip.extend(threshold)
+        if self.__table is None or self.__table.size != 2 * self.__ip.power + 1:
+            self.__table = self.__ip.get_inner_product_table()
+        return self.__table
+
+    def __get_column(self, table: np.ndarray, pows: np.ndarray, p: int) -> Tuple[np.ndarray, complex]:
+        r"""Get the column of the Hermitian part of V of the Ansatz power ``p`` and its entry of q.
+
+        Args:
+            table (np.ndarray): the lookup table of inner products
+            pows (np.ndarray): the Ansatz powers of the rows
+            p (int): the Ansatz power of the column
+
+        Returns:
+            Tuple[np.ndarray, complex]: the entries :math:`(V[t_1, p] + \overline{V[p, t_1]}) / 2` for all powers
+            :math:`t_1` of ``pows``, and the entry of q
+        """
+        center = self.__ip.power
+        col = (self.__get_sequence(table, p - pows) + np.conj(self.__get_sequence(table, pows - p))) / 2
+        q_R = np.sum(np.real(self.__C_coeffs * table.real[p + self.__C_pows + center]))
+        q_I = -np.sum(np.real(self.__C_coeffs * table.imag[p + self.__C_pows + center]))
+        return col, q_R + 1j * q_I
+
+    def __get_sequence(self, table: np.ndarray, lags: np.ndarray) -> np.ndarray:
+        r"""Get the entries of V for the given differences of the Ansatz powers.
+
+        Args:
+            table (np.ndarray): the lookup table of inner products
+            lags (np.ndarray): the differences of the Ansatz powers
+
+        Returns:
+            np.ndarray: the complex entries of V
+        """
+        center = self.__ip.power
+        v_R = np.zeros(lags.size, dtype=np.float64)
+        v_I = np.zeros(lags.size, dtype=np.float64)
+        for k_1 in range(self.__C_coeffs.size):
+            for k_2 in range(self.__C_coeffs.size):
+                idx = lags + (self.__C_pows[k_2] - self.__C_pows[k_1]) + center
+                v_R += np.real(self.__coeff_prod[k_1, k_2] * table.real[idx])
+                v_I += np.real(self.__coeff_prod[k_1, k_2] * table.imag[idx])
+        return v_R + 1j * v_I
+
+    def __add_power(self, p: int) -> bool:
+        r"""Append the Ansatz power ``p`` to the factorization by a rank-1 border update.
+
+        Args:
+            p (int): the Ansatz power
+
+        Returns:
+            bool: whether the power is appended
+        """
+        size = len(self.__pows)
+        pows = np.array(self.__pows + [p], dtype=np.int64)
+        table = self.__get_table(2 * (np.max(np.abs(pows)) + np.max(np.abs(self.__C_pows), initial=0)))
+        # The new column of V for all accepted powers and p itself, and the new entry of q
+        col, q_p = self.__get_column(table, pows, p)
+
+        L = self.__L[:size, :size]
+        border = solve_triangular(L, col[:size], lower=True, check_finite=False) if size > 0 else col[:0]
+        pivot = np.real(col[size]) - np.real(np.vdot(border, border))
+        if pivot <= self.__rcond * abs(np.real(col[size])):
+            return False
+        if size + 1 > self.__L.shape[0]:
+            capacity = max(size + 1, 2 * self.__L.shape[0])
+            new_L = np.zeros((capacity, capacity), dtype=np.complex128)
+            new_L[:size, :size] = L
+            new_y = np.zeros(capacity, dtype=np.complex128)
+            new_y[:size] = self.__y[:size]
+            self.__L, self.__y = new_L, new_y
+        diag = np.sqrt(pivot)
+        self.__L[size, :size] = np.conj(border)
+        self.__L[size, size] = diag
+        self.__y[size] = (q_p - np.vdot(border, self.__y[:size])) / diag
+        self.__pows.append(p)
+        return True
+
+    def __refactor(self):
+        r"""Rebuild the factorization of all the Ansatz powers up to the current threshold by pivoted Cholesky.
+
+        The most independent powers are accepted first, down to the relative pivot ``rcond``, see ``_pivoted_cholesky``.
+        """
+        t = self.__threshold
+        pows = np.arange(-t, t + 1, dtype=np.int64)
+        table = self.__get_table(2 * (t + np.max(np.abs(self.__C_pows), initial=0)))
+        columns = [self.__get_column(table, pows, p) for p in pows]
+        V = np.stack([col for col, _ in columns], axis=1)
+        q = np.array([q_p for _, q_p in columns])
+        L, y, order = _pivoted_cholesky(V, q, self.__rcond)
+        self.__set_factor(L, y, [int(p) for p in pows[order]])
+
+    def __set_factor(self, L: np.ndarray, y: np.ndarray, pows: List[int]):
+        r"""Replace the factorization.
+
+        Args:
+            L (np.ndarray): the Cholesky factor in the order of the powers
+            y (np.ndarray): the vector :math:`L^{-1} q`
+            pows (List[int]): the accepted Ansatz powers
+        """
+        size = len(pows)
+        capacity = max(self.__L.shape[0], size)
+        self.__L = np.zeros((capacity, capacity), dtype=np.complex128)
+        self.__L[:size, :size] = L
+        self.__y = np.zeros(capacity, dtype=np.complex128)
+        self.__y[:size] = y
+        self.__pows = list(pows)
+
+
+# Test
+if __name__ == "__main__":
+    from circulant_solver.calculation import calculate_W_r
+    from circulant_solver.metrics import get_metrics
+    # A smooth b makes V numerically singular; the loss must be the squared residual of the returned parameters,
+    # and can never be below the least-squares optimum over the same Ansatz
+    x = np.arange(2 ** 8)
+    vec_b = np.exp(-((x - x.size / 2) / 6) ** 2)
+    vec_b /= np.linalg.norm(vec_b)
+    C = Circulant(3, [0, 1, -1], [-2.01, 1, 1])
+    ip = InnerProduct("fft", vec_b, 1, 14)
+    for T in range(5, 15):
+        loss, alpha = solve_combination_parameters(*calculate_W_r(C, list(range(-T, T + 1)), ip))
+        A = np.stack([C.matvec(np.roll(vec_b, t)) for t in range(-T, T + 1)], axis=1)
+        optimum = np.linalg.norm(A @ np.linalg.lstsq(A, vec_b, rcond=None)[0] - vec_b) ** 2
+        print(T, loss, get_metrics(C, vec_b, alpha, T)["residual"] ** 2, optimum)
@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from typing import List, Optional, Dict, Callable
+from qiskit import QuantumCircuit
+from qiskit.providers import Backend, JobStatus
+from qiskit.result import Result
+
+__all__ = [
+    "JobScheduler",
+    "get_scheduler"
+]
+
+logger = logging.getLogger(__name__)
+
+
+class JobScheduler:
+    r"""Set the asynchronous job scheduler.
+
+    The scheduler runs an asyncio event loop in a background thread. Jobs are submitted through ``submit``,
+    which immediately returns a future of the result. Every job is polled with exponential backoff and its future
+    is resolved as soon as the job completes. The number of unfinished jobs per backend is capped, and the jobs of
+    all callers (e.g. several InnerProduct computations in different threads) share the same queue.
+
+    Attributes:
+        max_concurrency (int): maximal number of unfinished jobs per backend
+        initial_wait (float): waiting time in seconds before the first poll of a job
+        max_wait (float): maximal waiting time in seconds between two polls of a job
+        backoff (float): growth factor of the waiting time between two polls
+    """
+
+    def __init__(self, max_concurrency: int = 5, initial_wait: float = 1.0, max_wait: float = 60.0 * 15,
+                 backoff: float = 2.0):
+        r"""Set the asynchronous job scheduler.
+
+        Args:
+            max_concurrency (int, optional): maximal number of unfinished jobs per backend
+            initial_wait (float, optional): waiting time in seconds before the first poll of a job
+            max_wait (float, optional): maximal waiting time in seconds between two polls of a job
+            backoff (float, optional): growth factor of the waiting time between two polls
+        """
+        self.max_concurrency = max_concurrency
+        self.initial_wait = initial_wait
+        self.max_wait = max_wait
+        self.backoff = backoff
+        self.__loop = asyncio.new_event_loop()
+        self.__thread = threading.Thread(target=self.__loop.run_forever, name="job-scheduler", daemon=True)
+        self.__thread.start()
+        self.__semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.__pending = 0
+        self.__lock = threading.Lock()
+
+    def submit(self, backend: Backend, circuits: List[QuantumCircuit], shots: int = 1024,
+               on_submit: Optional[Callable] = None) -> Future:
+        r"""Submit circuits as one job to the backend.
+
+        Args:
+            backend (Backend): the backend supported on Qiskit
+            circuits (List[QuantumCircuit]): transpiled circuits
+            shots (int, optional): number of measurements
+            on_submit (Callable, optional): function called with the job as soon as it is submitted
+
+        Returns:
+            Future: the future of the result of the job
+        """
+        with self.__lock:
+            self.__pending += 1
+        return asyncio.run_coroutine_threadsafe(self.__run(backend, circuits, shots, on_submit), self.__loop)
+
+    def attach(self, backend: Backend, job) -> Future:
+        r"""Wait for a job that has been submitted before, e.g. a job retrieved from a previous run.
+
+        Args:
+            backend (Backend): the backend of the job
+            job (JobV1): the submitted job
+
+        Returns:
+            Future: the future of the result of the job
+        """
+        with self.__lock:
+            self.__pending += 1
+        return asyncio.run_coroutine_threadsafe(self.__run(backend, job=job), self.__loop)
+
+    def gather(self, futures: List[Future]) -> List[Result]:
+        r"""Wait for the results of submitted jobs.
+
+        Args:
+            futures (List[Future]): futures returned by ``submit``
+
+        Returns:
+            List[Result]: the results, in the order of the futures
+        """
+        return [future.result() for future in futures]
+
+    def close(self):
+        r"""Stop the event loop of the scheduler."""
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
+        self.__thread.join()
+
+    async def __run(self, backend: Backend, circuits: Optional[List[QuantumCircuit]] = None, shots: int = 1024,
+                    on_submit: Optional[Callable] = None, job=None) -> Result:
+        r"""Submit a job once a slot of the backend is free, and poll it with exponential backoff.
+
+        Args:
+            backend (Backend): the backend supported on Qiskit
+            circuits (List[QuantumCircuit], optional): transpiled circuits
+            shots (int, optional): number of measurements
+            on_submit (Callable, optional): function called with the job as soon as it is submitted
+            job (JobV1, optional): a job submitted before, which is only polled
+
+        Returns:
+            Result: the result of the job
+        """
+        name = backend.name() if callable(backend.name) else backend.name
+        if name not in self.__semaphores:
+            self.__semaphores[name] = asyncio.Semaphore(self.max_concurrency)
+        loop = asyncio.get_running_loop()
+        try:
+            async with self.__semaphores[name]:
+                start_time = datetime.now()
+                if job is None:
+                    job = await loop.run_in_executor(None, lambda: backend.run(circuits, shots=shots))
+                    if on_submit is not None:
+                        on_submit(job)
+                wait = self.initial_wait
+                while True:
+                    await asyncio.sleep(wait)
+                    status = await loop.run_in_executor(None, job.status)
+                    if status == JobStatus.ERROR:
+                        raise RuntimeError("Job failed.")
+                    elif status == JobStatus.CANCELLED:
+                        raise RuntimeError("Job cancelled.")
+                    elif status == JobStatus.DONE:
+                        break
+                    logger.warning('Job {} waiting time: {:.2f} hours'.format(
+                        job.job_id(), (datetime.now() - start_time).seconds / 3600.0))
+                    wait = min(self.backoff * wait, self.max_wait)
+                result = await loop.run_in_executor(None, job.result)
+        finally:
+            with self.__lock:
+                self.__pending -= 1
+                pending = self.__pending
+        logger.warning(f'Remaining jobs:{pending}')
+        return result
+
+
+# The scheduler shared by all inner product computations
+_SCHEDULER: Optional[JobScheduler] = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def get_scheduler() -> JobScheduler:
+    r"""Get the scheduler shared by all inner product computations.
+
+    Returns:
+        JobScheduler: the shared scheduler
+    """
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            _SCHEDULER = JobScheduler()
+        return _SCHEDULER
+
+
+# Test
+if __name__ == "__main__":
+    import numpy as np
+    from concurrent.futures import ThreadPoolExecutor
+    from qiskit import Aer, transpile
+    from circulant_solver.util import FakeQueueBackend
+    from circulant_solver.inner_product import InnerProduct
+    backend = FakeQueueBackend(Aer.get_backend('aer_simulator_statevector'), latency=3.0)
+    scheduler = JobScheduler(max_concurrency=2, initial_wait=0.5)
+    circuit = QuantumCircuit(1, 1)
+    circuit.h(0)
+    circuit.measure(0, 0)
+    circuit = transpile(circuit, backend)
+    start = datetime.now()
+    # Four jobs with a latency of three seconds and two slots finish after about six seconds
+    futures = [scheduler.submit(backend, [circuit], 1024) for _ in range(4)]
+    print([result.get_counts() for result in scheduler.gather(futures)], datetime.now() - start)
+    # Several inner product computations share the same queue
+    vec_b = np.array([1, 1j, -1, -1j]) / 2
+    with ThreadPoolExecutor() as executor:
+        ips = list(executor.map(lambda q_pow: InnerProduct("fake-queue", np.roll(vec_b, q_pow), 1, 2, 1024,
+                                                           scheduler=scheduler), range(3)))
+    print([ip.pos_inner_product_imag for ip in ips], datetime.now() - start)
+    scheduler.close()
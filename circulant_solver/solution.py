@@ -0,0 +1,96 @@
+import numpy as np
+from typing import List, Optional, Union, Tuple, Dict
+from qiskit import QuantumCircuit
+from circulant_solver.state import get_vector_b
+
+__all__ = [
+    "reconstruct_solution"
+]
+
+
+def reconstruct_solution(b: Union[np.ndarray, QuantumCircuit, Tuple[Dict[int, complex], int]], alpha: List,
+                         threshold: Optional[int] = None, method: str = "auto",
+                         out: Optional[Union[str, np.ndarray]] = None, chunk_size: int = 2 ** 16) -> np.ndarray:
+    r"""Reconstruct the solution :math:`x = \sum_{t=-T}^{T} \alpha_t Q^t b` of the Ansatz.
+
+    Since :math:`Q^t b` is the cyclic shift of b by t, the solution is the cyclic convolution of b with the
+    coefficients placed at the offsets -T, ..., T, and no shifted copy of b is ever formed. There are two methods:
+
+        "shift": accumulate the shifted slices of b chunk by chunk, which costs O(T N) time;
+        "fft": convolve each chunk of b, padded by T entries on both sides, with the coefficients by the fast Fourier
+        transformation (overlap-save), which costs O(N log(chunk_size + T)) time.
+
+    Both methods take O(chunk_size + T) memory besides b and the output, so that the output can be streamed into a
+    memory-mapped file.
+
+    By default ("auto"), the direct shifts are used when T is small compared to log N.
+
+    Args:
+        b (Union[np.ndarray, QuantumCircuit, Tuple[Dict[int, complex], int]]): the description of vector b
+        alpha (List): the combination parameters of the powers from -threshold to threshold
+        threshold (int, optional): truncation threshold, by default derived from the length of alpha
+        method (str, optional): "auto", "shift" or "fft"
+        out (Union[str, np.ndarray], optional): the array to write the solution into, e.g. a ``np.memmap``,
+                                                or the path of a new memory-mapped file
+        chunk_size (int, optional): number of entries written at a time
+
+    Returns:
+        np.ndarray: the solution x (the output array if given)
+    """
+    vec_b = get_vector_b(b)
+    alpha = np.asarray(alpha, dtype=np.complex128).reshape(-1)
+    if threshold is None:
+        threshold = (alpha.size - 1) // 2
+    if alpha.size != 2 * threshold + 1:
+        raise ValueError(f"{alpha.size} parameters are given for threshold {threshold}")
+    dim = vec_b.size
+    if method == "auto":
+        method = "shift" if 2 * threshold + 1 <= np.log2(max(dim, 2)) else "fft"
+    if isinstance(out, str):
+        out = np.memmap(out, dtype=np.complex128, mode="w+", shape=(dim,))
+    elif out is None:
+        out = np.empty(dim, dtype=np.complex128)
+    if method == "fft":
+        # The chunks are long compared to the coefficients, so that the padding does not dominate the transforms
+        chunk_size = max(chunk_size, 8 * threshold)
+        kernel_fft = None
+        for start in range(0, dim, chunk_size):
+            stop = min(start + chunk_size, dim)
+            segment = np.take(vec_b, np.arange(start - threshold, stop + threshold), mode="wrap")
+            if kernel_fft is None or kernel_fft.size != segment.size:
+                kernel_fft = np.fft.fft(alpha, segment.size)
+            # The first 2T entries of the cyclic convolution wrap around the segment and are discarded
+            out[start:stop] = np.fft.ifft(np.fft.fft(segment) * kernel_fft)[2 * threshold:]
+    elif method == "shift":
+        for start in range(0, dim, chunk_size):
+            idx = np.arange(start, min(start + chunk_size, dim))
+            chunk = np.zeros(idx.size, dtype=np.complex128)
+            # (Q^t b)_i = b_{i - t}
+            for coeff, q_pow in zip(alpha, range(-threshold, threshold + 1)):
+                if coeff != 0:
+                    chunk += coeff * np.take(vec_b, idx - q_pow, mode="wrap")
+            out[start:start + idx.size] = chunk
+    else:
+        raise NotImplementedError(f"unknown method {method}")
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out
+
+
+# Test
+if __name__ == "__main__":
+    import os
+    import tempfile
+    from datetime import datetime
+    vec_b = np.random.rand(2 ** 20) + 1j * np.random.rand(2 ** 20)
+    for T in [2, 10, 40, 500]:
+        alpha = np.random.rand(2 * T + 1)
+        times = []
+        for method in ["shift", "fft"]:
+            start = datetime.now()
+            x = reconstruct_solution(vec_b, alpha, T, method)
+            times.append((datetime.now() - start).total_seconds())
+        print(T, times, np.allclose(x, reconstruct_solution(vec_b, alpha, T, "shift")))
+    path = os.path.join(tempfile.mkdtemp(), "x.dat")
+    x = reconstruct_solution(vec_b, np.random.rand(21), method="shift", out=path)
+    print(type(x).__name__, np.allclose(np.memmap(path, dtype=np.complex128, mode="r"), x))
@@ -0,0 +1,161 @@
+import hashlib
+import numpy as np
+from collections import OrderedDict
+from typing import Union, Tuple, Dict
+from qiskit import QuantumCircuit
+from qiskit.circuit.library.standard_gates import get_standard_gate_name_mapping
+from qiskit.quantum_info import Statevector
+
+__all__ = [
+    "circuit_hash",
+    "get_b_hash",
+    "get_sparse_b",
+    "get_vector_b",
+    "get_dimension"
+]
+
+# Memoized vectors b of the recently used circuits, keyed by their structural hashes
+_VECTOR_CACHE = OrderedDict()
+_VECTOR_CACHE_SIZE = 8
+_STANDARD_GATES = set(get_standard_gate_name_mapping().keys())
+
+
+def circuit_hash(circuit: QuantumCircuit) -> str:
+    r"""Calculate the structural hash of a quantum circuit.
+
+    Two circuits with the same width, global phase and sequence of instructions (names, parameters, qubits and
+    classical bits) have the same hash, no matter whether they are the same Python object.
+
+    Args:
+        circuit (QuantumCircuit): quantum circuit
+
+    Returns:
+        str: the hexadecimal SHA-256 digest of the circuit structure
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{circuit.num_qubits};{circuit.num_clbits};{circuit.global_phase}\n".encode())
+    for instruction in circuit.data:
+        operation = instruction.operation
+        qubits = [circuit.find_bit(qubit).index for qubit in instruction.qubits]
+        clbits = [circuit.find_bit(clbit).index for clbit in instruction.clbits]
+        params = [str(param) for param in operation.params]
+        digest.update(f"{operation.name};{params};{qubits};{clbits}\n".encode())
+        if operation.name not in _STANDARD_GATES and getattr(operation, "definition", None) is not None:
+            # Custom gates are distinguished by their definitions
+            digest.update(circuit_hash(operation.definition).encode())
+    return digest.hexdigest()
+
+
+def get_b_hash(b: Union[np.ndarray, QuantumCircuit, Tuple[Dict[int, complex], int]]) -> str:
+    r"""Calculate the hash of the description of b.
+
+    Arrays are hashed by their data type, shape and bytes, circuits by their structure (see ``circuit_hash``),
+    and the sparse description by its canonical index and value arrays and size (see ``get_sparse_b``).
+
+    Args:
+        b (Union[np.ndarray, QuantumCircuit, Tuple[Dict[int, complex], int]]): the array, quantum circuit
+                                                                              or sparse description of b
+
+    Returns:
+        str: the hexadecimal SHA-256 digest
+    """
+    if isinstance(b, QuantumCircuit):
+        return circuit_hash(b)
+    digest = hashlib.sha256()
+    if isinstance(b, np.ndarray):
+        b = np.ascontiguousarray(b)
+        digest.update(f"array;{b.dtype.str};{b.shape}\n".encode())
+        digest.update(b.tobytes())
+    elif isinstance(b, tuple):
+        indices, values, size = get_sparse_b(b)
+        digest.update(f"sparse;{size};{values.dtype.str}\n".encode())
+        digest.update(indices.tobytes())
+        digest.update(values.tobytes())
+    else:
+        raise NotImplementedError
+    return digest.hexdigest()
+
+
+def get_sparse_b(b: Union[Tuple[Dict[int, complex], int],
+                          Tuple[np.ndarray, np.ndarray, int]]) -> Tuple[np.ndarray, np.ndarray, int]:
+    r"""Get the canonical sparse description of b, i.e. sorted index and value arrays.
+
+    The indices are taken modulo the size, and the values of repeated indices are summed.
+
+    Args:
+        b (Union[Tuple[Dict[int, complex], int], Tuple[np.ndarray, np.ndarray, int]]): the sparse description of b,
+            either a dictionary from indices to values or the arrays of indices and values, with the size
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, int]: the sorted unique indices, the complex values and the size
+    """
+    if len(b) == 2:
+        dict_b, size = b
+        indices = np.fromiter(dict_b.keys(), dtype=np.int64, count=len(dict_b))
+        values = np.fromiter(dict_b.values(), dtype=np.complex128, count=len(dict_b))
+    else:
+        indices, values, size = b
+        indices = np.asarray(indices, dtype=np.int64)
+        values = np.asarray(values, dtype=np.complex128)
+    indices, inverse = np.unique(np.mod(indices, size), return_inverse=True)
+    summed = np.zeros(indices.size, dtype=np.complex128)
+    np.add.at(summed, inverse, values)
+    return indices, summed, int(size)
+
+
+def get_vector_b(b: Union[np.ndarray, QuantumCircuit, Tuple[Dict[int, complex], int],
+                         Tuple[np.ndarray, np.ndarray, int]]) -> np.ndarray:
+    r"""Get the vector b from its different descriptions.
+
+    If b is given by a quantum circuit, it is evaluated as a statevector, which only takes O(2^n) memory instead
+    of the full 2^n x 2^n unitary. The vectors of the recently used circuits are memoized by structural hash,
+    so that repeated requests for the same circuit are free. The returned vector is read-only.
+
+    Args:
+        b (Union[np.ndarray, QuantumCircuit, Tuple[Dict[int, complex], int]]): the array, quantum circuit
+                                                                              or sparse description of b
+
+    Returns:
+        np.ndarray: the vector b
+    """
+    if isinstance(b, np.ndarray):
+        return b
+    elif isinstance(b, tuple):
+        indices, values, size = get_sparse_b(b)
+        vec_b = np.zeros(size, dtype=np.complex128)
+        vec_b[indices] = values
+        return vec_b
+    elif isinstance(b, QuantumCircuit):
+        key = circuit_hash(b)
+        if key in _VECTOR_CACHE:
+            _VECTOR_CACHE.move_to_end(key)
+            return _VECTOR_CACHE[key]
+        vec_b = Statevector(b).data
+        vec_b.flags.writeable = False
+        _VECTOR_CACHE[key] = vec_b
+        if len(_VECTOR_CACHE) > _VECTOR_CACHE_SIZE:
+            _VECTOR_CACHE.popitem(last=False)
+        return vec_b
+    else:
+        raise NotImplementedError
+
+
+def get_dimension(b: Union[np.ndarray, QuantumCircuit, Tuple[Dict[int, complex], int],
+                           Tuple[np.ndarray, np.ndarray, int]]) -> int:
+    r"""Get the dimension of the vector b without evaluating it.
+
+    Args:
+        b (Union[np.ndarray, QuantumCircuit, Tuple[Dict[int, complex], int]]): the array, quantum circuit
+                                                                              or sparse description of b
+
+    Returns:
+        int: the dimension of b
+    """
+    if isinstance(b, np.ndarray):
+        return b.size
+    elif isinstance(b, tuple):
+        return int(b[-1])
+    elif isinstance(b, QuantumCircuit):
+        return 2 ** b.num_qubits
+    else:
+        raise NotImplementedError
@@ -0,0 +1,97 @@
+import numpy as np
+
+__all__ = [
+    "Toeplitz"
+]
+
+
+class Toeplitz:
+    r"""Set the structured ``W`` matrix.
+
+    When the Ansatz consists of consecutive powers of the permutation, the block V of the auxiliary matrix W
+    only depends on the difference of the powers, i.e. V is a Toeplitz matrix:
+
+    .. math::
+
+            V_{t_1 t_2} = v_{t_2 - t_1},  \quad  t_1, t_2 = 0, \dots, T - 1.
+
+    This class stores the generating sequence :math:`v_{-(T-1)}, \dots, v_{T-1}` instead of the dense matrix.
+    The dense auxiliary matrix W is the real embedding of V, which can still be obtained for small sizes.
+
+    Attributes:
+        sequence (np.ndarray): complex generating sequence of length 2T - 1, ordered from lag -(T-1) to T-1
+    """
+
+    def __init__(self, sequence: np.ndarray):
+        r"""Set the structured ``W`` matrix.
+
+        Args:
+            sequence (np.ndarray): complex generating sequence of length 2T - 1, ordered from lag -(T-1) to T-1
+        """
+        sequence = np.asarray(sequence, dtype=np.complex128)
+        if sequence.ndim != 1 or sequence.size % 2 == 0:
+            raise ValueError("the generating sequence should be a one-dimensional array of odd length")
+        self.__sequence = sequence
+        self.__size = (sequence.size + 1) // 2
+
+    def get_size(self) -> int:
+        r"""Get the size T of the Toeplitz block V.
+
+        Returns:
+            int: the number of Ansatz vectors
+        """
+        return self.__size
+
+    def get_sequence(self) -> np.ndarray:
+        r"""Get the generating sequence.
+
+        Returns:
+            np.ndarray: complex generating sequence ordered from lag -(T-1) to T-1
+        """
+        return self.__sequence
+
+    def get_column(self) -> np.ndarray:
+        r"""Get the first column of V, i.e. the lags 0, -1, ..., -(T-1).
+
+        Returns:
+            np.ndarray: the first column of V
+        """
+        return self.__sequence[self.__size - 1::-1]
+
+    def get_row(self) -> np.ndarray:
+        r"""Get the first row of V, i.e. the lags 0, 1, ..., T-1.
+
+        Returns:
+            np.ndarray: the first row of V
+        """
+        return self.__sequence[self.__size - 1:]
+
+    def hermitian_part(self) -> "Toeplitz":
+        r"""Get the Hermitian part :math:`(V + V^\dagger) / 2`, which is again a Toeplitz matrix.
+
+        The quadratic form of the real embedding W only depends on the Hermitian part of V.
+        For exact inner products V is already Hermitian; for estimated inner products it removes the noise
+        that does not contribute to the loss.
+
+        Returns:
+            Toeplitz: the Hermitian part of V
+        """
+        return Toeplitz((self.__sequence + np.conj(self.__sequence[::-1])) / 2)
+
+    def get_matrix(self) -> np.ndarray:
+        r"""Get the dense complex Toeplitz block V.
+
+        Returns:
+            np.ndarray: the T x T complex matrix V
+        """
+        lags = np.arange(self.__size)
+        return self.__sequence[lags[np.newaxis, :] - lags[:, np.newaxis] + self.__size - 1]
+
+    def get_real_matrix(self) -> np.ndarray:
+        r"""Get the dense auxiliary matrix W, i.e. the real embedding of V.
+
+        Returns:
+            np.ndarray: the 2T x 2T real matrix W
+        """
+        V = self.get_matrix()
+        return np.block([[V.real, -V.imag], [V.imag, V.real]])
@@ -1,10 +1,14 @@
+import time
 import numpy as np
 from qiskit import Aer
-from qiskit.providers import Backend
+from typing import Dict
+from qiskit.providers import Backend, JobStatus
 
 __all__ = [
     "get_permutation_matrix",
-    "get_backend"
+    "get_backend",
+    "get_backend_name",
+    "FakeQueueBackend"
 ]
 
 
@@ -18,15 +22,8 @@ def get_permutation_matrix(dim: int, p: int) -> np.ndarray:
     Returns:
         np.ndarray: the matrix of permutation operator
     """
-    Q = np.zeros((dim, dim))
-    for k in range(0, dim):
-        s = k - p
-        if s >= dim:
-            s -= dim
-        if s <= -dim:
-            s += dim
-        Q[k][s] = 1
-    return Q
+    # Row k has its only nonzero entry in column k - p (mod dim), i.e. the rows of the identity shifted by p
+    return np.roll(np.eye(dim), p, axis=0)
 
 
 def get_backend(access: str) -> Backend:
@@ -40,6 +37,8 @@ def get_backend(access: str) -> Backend:
     """
     if access == 'qiskit-aer':
         backend = Aer.get_backend('aer_simulator_statevector')
+    elif access == 'fake-queue':
+        backend = FakeQueueBackend(Aer.get_backend('aer_simulator_statevector'))
     elif access == 'ibmq-statevector':
         try:
             from qiskit_ibm_provider import IBMProvider
@@ -68,3 +67,124 @@ def get_backend(access: str) -> Backend:
         raise NotImplementedError
 
     return backend
+
+
+def get_backend_name(backend: Backend) -> str:
+    r"""Get the name of a backend of version 1 or 2.
+
+    Args:
+        backend (Backend): the backend supported on Qiskit
+
+    Returns:
+        str: the name of the backend
+    """
+    return backend.name() if callable(backend.name) else backend.name
+
+
+class FakeQueueJob:
+    r"""Set the job of the local backend with simulated queue latency.
+
+    The job reports the status QUEUED until its simulated queue latency has elapsed,
+    and the status of the underlying simulation afterwards.
+
+    Attributes:
+        job (JobV1): the job of the underlying simulation
+        ready_time (float): the time when the job leaves the simulated queue
+    """
+
+    def __init__(self, job, ready_time: float):
+        r"""Set the job of the local backend with simulated queue latency.
+
+        Args:
+            job (JobV1): the job of the underlying simulation
+            ready_time (float): the time when the job leaves the simulated queue
+        """
+        self.job = job
+        self.ready_time = ready_time
+
+    def job_id(self) -> str:
+        r"""Get the ID of the job.
+
+        Returns:
+            str: the ID of the underlying simulation job
+        """
+        return self.job.job_id()
+
+    def status(self) -> JobStatus:
+        r"""Get the status of the job.
+
+        Returns:
+            JobStatus: QUEUED before the latency has elapsed, and the status of the simulation afterwards
+        """
+        if time.monotonic() < self.ready_time:
+            return JobStatus.QUEUED
+        return self.job.status()
+
+    def result(self):
+        r"""Wait for the job and get its result.
+
+        Returns:
+            Result: the result of the underlying simulation
+        """
+        time.sleep(max(self.ready_time - time.monotonic(), 0))
+        return self.job.result()
+
+
+class FakeQueueBackend:
+    r"""Set the local backend with simulated queue latency.
+
+    This backend runs the circuits on a local simulator, but its jobs stay in a simulated queue for a given latency,
+    which allows to test the handling of hardware queues without hardware access.
+    All other attributes, e.g. the configuration used by the transpiler, are the ones of the local simulator.
+
+    Attributes:
+        backend (Backend): the local simulator
+        latency (float): the queue latency of every job in seconds
+    """
+
+    def __init__(self, backend: Backend, latency: float = 2.0):
+        r"""Set the local backend with simulated queue latency.
+
+        Args:
+            backend (Backend): the local simulator
+            latency (float, optional): the queue latency of every job in seconds
+        """
+        self.backend = backend
+        self.latency = latency
+
+    # The submitted jobs of all instances, indexed by their IDs, which plays the role of the job database of a provider
+    _JOBS: Dict[str, FakeQueueJob] = {}
+
+    def __getattr__(self, item):
+        return getattr(self.backend, item)
+
+    @property
+    def name(self) -> str:
+        return "fake_queue"
+
+    def run(self, circuits, **kwargs) -> FakeQueueJob:
+        r"""Submit circuits to the simulated queue.
+
+        Args:
+            circuits (Union[QuantumCircuit, List[QuantumCircuit]]): transpiled circuits
+            **kwargs: options of the local simulator, e.g. the number of shots
+
+        Returns:
+            FakeQueueJob: the submitted job
+        """
+        job = FakeQueueJob(self.backend.run(circuits, **kwargs), time.monotonic() + self.latency)
+        FakeQueueBackend._JOBS[job.job_id()] = job
+        return job
+
+    def retrieve_job(self, job_id: str) -> FakeQueueJob:
+        r"""Retrieve a job submitted before, e.g. by a previous run.
+
+        Args:
+            job_id (str): the ID of the job
+
+        Returns:
+            FakeQueueJob: the submitted job
+        """
+        if job_id not in FakeQueueBackend._JOBS:
+            raise KeyError(f"unknown job {job_id}")
+        return FakeQueueBackend._JOBS[job_id]
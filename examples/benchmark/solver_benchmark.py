@@ -0,0 +1,66 @@
+# !/usr/bin/env python3
+
+"""
+    This is the benchmark of the solvers for the optimal combination parameters.
+    We use the circulant matrix of the heat transfer problem:
+                    C = (−2 − ξ)I + Q + Q^−1,
+    and compare the running time and the loss of different solvers over the truncation threshold:
+
+        "direct": Cholesky factorization of the complex T x T system;
+        "toeplitz": Levinson recursion on the structured Toeplitz form of W;
+        "cvxopt": the interior-point quadratic solver of CVXOPT on the 2T x 2T real embedding.
+
+    The inner products are calculated exactly by the fast Fourier transformation,
+    so that only the solvers are timed.
+"""
+from circulant_solver.circulant import Circulant
+from circulant_solver.inner_product import InnerProduct
+from circulant_solver.calculation import calculate_W_r, calculate_W_r_toeplitz
+from circulant_solver.optimization import solve_combination_parameters
+import matplotlib.pyplot as plt
+import numpy as np
+import time
+
+# 1. Problem Setting
+number_of_terms = 3
+xi = 0.002
+pows = [0, 1, -1]
+coeffs = [- 2 - xi, 1, 1]
+C = Circulant(number_of_terms, permu_pows=pows, coeffs=coeffs)
+# Vector b is a random state of n qubits
+n = 10
+np.random.seed(0)
+b = np.random.randn(2 ** n) + 1j * np.random.randn(2 ** n)
+b = b / np.linalg.norm(b)
+
+# Solvers and truncation thresholds
+solvers = ["direct", "toeplitz", "cvxopt"]
+T_List = [10, 20, 50, 100, 200]
+ip = InnerProduct("fft", b, np.max(np.abs(pows)), np.max(T_List))
+
+# 2. Benchmark
+times = {solver: [] for solver in solvers}
+losses = {solver: [] for solver in solvers}
+for t in T_List:
+    Ansatz_pows = list(range(-t, t + 1))
+    W, r = calculate_W_r(C, Ansatz_pows, ip)
+    W_toeplitz, r_toeplitz = calculate_W_r_toeplitz(C, Ansatz_pows, ip)
+    for solver in solvers:
+        start = time.perf_counter()
+        if solver == "toeplitz":
+            loss, alpha = solve_combination_parameters(W_toeplitz, r_toeplitz, solver)
+        else:
+            loss, alpha = solve_combination_parameters(W, r, solver)
+        times[solver].append(time.perf_counter() - start)
+        losses[solver].append(loss)
+    print(f"T = {t}:", {solver: f"{times[solver][-1]:.4f}s, loss {losses[solver][-1]:.3e}" for solver in solvers})
+
+# Plot the results
+plt.title("Figure: Running time - truncation threshold", fontsize=10)
+for solver in solvers:
+    plt.loglog(T_List, times[solver], linewidth=2.5, label=solver)
+lgd = plt.legend()
+lgd.set_title("Solver")
+plt.xlabel("Truncation threshold", fontsize=10)
+plt.ylabel("Running time (s)", fontsize=10)
+plt.show()
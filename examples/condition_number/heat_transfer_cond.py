@@ -27,7 +27,8 @@
     Experiments are conducted using the sparse matrix estimator to get rid of the shot noise.
 """
 from circulant_solver.circulant import Circulant
-from main import cqs_circulant_cond_main
+from circulant_solver.cache import InnerProductCache
+from main import cqs_circulant_cond_main, cqs_circulant_parallel_main
 import matplotlib.pyplot as plt
 import numpy as np
 import sys
@@ -41,7 +42,8 @@ number_of_terms = 3
 # shot budget per Hadamard test
 shots = 10 ** 6
 # Simulation / hardware access
-access = "true"
+# access = "true"
+access = "fft"
 # System size
 # Circuit for preparation of b
 n = 15
@@ -89,11 +91,15 @@ XI = [0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2
 # Close the log file
 log_file = None
 
+# The inner products only depend on b, so they are shared by all the values of ξ (and by later runs)
+cache = InnerProductCache()
+
 # Initialize
 T_list = []
 Cond_list = []
 
 # Use the algorithm to solve the circulant linear systems with different condition numbers
+Cs = []
 for xi in XI:
     cond_num = (xi + 4) / xi
     print("Condition number is:", cond_num)
@@ -103,9 +109,16 @@ for xi in XI:
     C = Circulant(number_of_terms, permu_pows=pows, coeffs=coeffs)
     print("Coefficients of the terms are:", coeffs)
     print("Decomposed powers of permutations are:", pows)
-    t = cqs_circulant_cond_main(C, U_b, access, shots, log_file)
+    Cs.append(C)
     Cond_list.append(cond_num)
-    T_list.append(t)
+# "linear" evaluates the thresholds one by one; "predict" starts from the threshold predicted by the spectrum of C
+# and only evaluates O(log T) thresholds, which gives the same threshold as long as the loss decreases with it
+search = "linear"
+if log_file is None:
+    # The matrices are solved in parallel processes sharing the same inner products
+    T_list = cqs_circulant_parallel_main(Cs, U_b, access, shots, cache=cache, search=search)
+else:
+    T_list = [cqs_circulant_cond_main(C, U_b, access, shots, log_file, cache=cache, search=search) for C in Cs]
 print("Condition numbers are:", Cond_list)
 print("Truncation thresholds are:", T_list)
 
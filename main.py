@@ -4,18 +4,27 @@
 
 __all__ = [
     "cqs_circulant_main",
-    'cqs_circulant_cond_main'
+    'cqs_circulant_cond_main',
+    "cqs_circulant_sweep_main",
+    "cqs_circulant_parallel_main"
 ]
 
 from circulant_solver.logger import log
 from circulant_solver.circulant import Circulant
 from circulant_solver.inner_product import InnerProduct
-from circulant_solver.calculation import calculate_W_r
-from circulant_solver.optimization import solve_combination_parameters
+from circulant_solver.calculation import calculate_W_r, sweep_W_r, calculate_W_r_batch, slice_W_r
+from circulant_solver.optimization import solve_combination_parameters, IncrementalSolver, \
+    solve_combination_parameters_batch
+from circulant_solver.state import get_vector_b, get_sparse_b, get_dimension
+from circulant_solver.metrics import get_metrics, predict_threshold
+from circulant_solver.allocation import allocate_shots
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 import numpy as np
-from typing import Union, List
+from typing import Union, List, Optional
 
-def cqs_circulant_main(C:Circulant, U_b, T: Union[int, List[int]], access, shots=1024, logfile=None):
+def cqs_circulant_main(C:Circulant, U_b, T: Union[int, List[int]], access, shots=1024, logfile=None,
+                       solver="direct", cache=None, ip=None, shot_budget=None, metrics=False):
     # Obtain the Ansatz basis
     if isinstance(T, list):
         max_T = np.max(T)
@@ -23,18 +32,110 @@ def cqs_circulant_main(C:Circulant, U_b, T: Union[int, List[int]], access, shots
         max_T = T
         T = [max_T]
     K = np.max(np.abs(C.get_pows()))
-    ip = InnerProduct(access, U_b, K, max_T, shots)
+    if ip is None:
+        ip = InnerProduct(access, U_b, K, max_T, shots, cache=cache)
+    else:
+        ip.extend(max_T)
+    if shot_budget is not None:
+        # The shots are the pilot round, and the budget is spent where it most reduces the variance of the loss
+        allocate_shots(C, ip, max_T, shot_budget, solver=solver)
     results = []
-    for t in T:
-        W, r = calculate_W_r(C, list(range(-t, t + 1)), ip)
-        loss, alpha = solve_combination_parameters(W, r)
+    # The metrics need the dense vector b, e.g. a statevector simulation of a circuit, so they are only on request
+    vec_b = get_vector_b(U_b) if metrics else None
+    # The auxiliary system is assembled once for max_T and sliced for the other thresholds
+    for t, W, r in sweep_W_r(C, T, ip, toeplitz=(solver == "toeplitz")):
+        loss, alpha = solve_combination_parameters(W, r, solver)
         if logfile is not None:
             log(C, U_b, W, r, t, alpha, loss, access, shots, logfile)
-        results.append((loss, alpha))
+        if metrics:
+            # Condition number of C, residual and error of the solution, evaluated by FFTs
+            results.append((loss, alpha, get_metrics(C, vec_b, alpha, t)))
+        else:
+            results.append((loss, alpha))
     return results
 
 
-def cqs_circulant_cond_main(C:Circulant, U_b, access, shots=1024, logfile=None):
+def _search_threshold(C: Circulant, U_b, access, shots, logfile, solver, cache, ip):
+    # The threshold predicted from the spectrum of C is bracketed by galloping, and the minimal threshold with
+    # loss < 0.01 is bisected, so that only O(log T) thresholds are evaluated; this finds the same threshold as the
+    # linear search as long as the loss decreases with the threshold, which holds for exact inner products since
+    # the Ansatz of a threshold contains the ones of the smaller thresholds; None if no threshold converges
+    K = np.max(np.abs(C.get_pows()))
+    # Powers beyond half of the dimension wrap around and do not enlarge the Ansatz
+    dim = get_dimension(U_b)
+    max_T = dim // 2
+    guess = predict_threshold(C, dim, 0.01)
+    guess = 1 if guess is None else min(guess, max_T)
+    if ip is None:
+        ip = InnerProduct(access, U_b, K, guess, shots, cache=cache)
+    # Each evaluation solves a single threshold
+    solver = "direct" if solver == "incremental" else solver
+    converged = {}
+
+    def evaluate(t):
+        if t not in converged:
+            ip.extend(t)
+            for _, W, r in sweep_W_r(C, [t], ip, toeplitz=(solver == "toeplitz")):
+                loss, alpha = solve_combination_parameters(W, r, solver)
+                if logfile is not None:
+                    log(C, U_b, W, r, t, alpha, loss, access, shots, logfile)
+                converged[t] = loss < 0.01
+        return converged[t]
+
+    # The largest failing threshold lo and the smallest converged threshold hi found so far
+    step = 1
+    if evaluate(guess):
+        lo, hi = -1, guess
+        while hi > 0:
+            t = max(hi - step, 0)
+            if not evaluate(t):
+                lo = t
+                break
+            hi = t
+            step *= 2
+    else:
+        lo = guess
+        while lo < max_T:
+            t = min(lo + step, max_T)
+            if evaluate(t):
+                hi = t
+                break
+            lo = t
+            step *= 2
+        else:
+            # Even the largest distinct Ansatz does not converge
+            return None
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if evaluate(mid):
+            hi = mid
+        else:
+            lo = mid
+    return hi
+
+
+def cqs_circulant_cond_main(C:Circulant, U_b, access, shots=1024, logfile=None, solver="direct", cache=None,
+                            ip=None, search="linear"):
+    K = np.max(np.abs(C.get_pows()))
+    # "linear": evaluate the thresholds one by one; "predict": start from the threshold predicted by the spectrum of C
+    if search == "predict":
+        return _search_threshold(C, U_b, access, shots, logfile, solver, cache, ip)
+    elif search != "linear":
+        raise NotImplementedError(f"unknown search {search}")
+    if solver == "incremental":
+        # The factorization is grown by one threshold at a time, and the inner products by 20 thresholds at a time
+        if ip is None:
+            ip = InnerProduct(access, U_b, K, 20, shots, cache=cache)
+        inc = IncrementalSolver(C, ip, step=20)
+        while True:
+            t = inc.get_threshold()
+            loss = inc.loss()
+            if logfile is not None:
+                W, r = calculate_W_r(C, list(range(-t, t + 1)), ip)
+                log(C, U_b, W, r, t, inc.get_alpha(), loss, access, shots, logfile)
+            if loss < 0.01:
+                return t
+            inc.grow()
     # Obtain the Ansatz basis
     T = 0
     conv = False
@@ -42,11 +143,13 @@ def cqs_circulant_cond_main(C:Circulant, U_b, access, shots=1024, logfile=None):
         prev_T = T
         T += 20
         max_T = T
-        K = np.max(np.abs(C.get_pows()))
-        ip = InnerProduct(access, U_b, K, max_T, shots)
-        for t in range(prev_T, T):
-            W, r = calculate_W_r(C, list(range(-t, t + 1)), ip)
-            loss, alpha = solve_combination_parameters(W, r)
+        # Only the inner products of the new powers are calculated
+        if ip is None:
+            ip = InnerProduct(access, U_b, K, max_T, shots, cache=cache)
+        else:
+            ip.extend(max_T)
+        for t, W, r in sweep_W_r(C, list(range(prev_T, T)), ip, toeplitz=(solver == "toeplitz")):
+            loss, alpha = solve_combination_parameters(W, r, solver)
             if logfile is not None:
                 log(C, U_b, W, r, t, alpha, loss, access, shots, logfile)
             if loss < 0.01:
@@ -54,4 +157,192 @@ def cqs_circulant_cond_main(C:Circulant, U_b, access, shots=1024, logfile=None):
                 return t
 
 
+def cqs_circulant_sweep_main(pows: List[int], coeffs, U_b, T: Union[int, List[int]], access, shots=1024, xi=None,
+                             cache=None, metrics=False):
+    # The inner products do not depend on the coefficients, so one table serves the whole batch of matrices
+    coeffs = np.atleast_2d(np.asarray(coeffs))
+    if xi is None:
+        xi = np.arange(coeffs.shape[0])
+    T = [T] if not isinstance(T, list) else T
+    max_T = int(np.max(T))
+    K = np.max(np.abs(pows))
+    ip = InnerProduct(access, U_b, K, max_T, shots, cache=cache)
+    W, r = calculate_W_r_batch(pows, coeffs, list(range(-max_T, max_T + 1)), ip)
+    results = np.empty(coeffs.shape[0] * len(T), dtype=[("xi", np.float64), ("T", np.int64), ("loss", np.float64),
+                                                         ("alpha", object), ("kappa", np.float64),
+                                                         ("residual", np.float64), ("error", np.float64)])
+    # The metrics need the dense vector b, so they are only on request and NaN otherwise
+    for name in ["kappa", "residual", "error"]:
+        results[name] = np.nan
+    vec_b = get_vector_b(U_b) if metrics else None
+    for j, t in enumerate(T):
+        W_t, r_t = slice_W_r(W, r, max_T, t)
+        losses, alphas = solve_combination_parameters_batch(W_t, r_t)
+        rows = results[j::len(T)]
+        rows["xi"] = xi
+        rows["T"] = t
+        rows["loss"] = losses
+        rows["alpha"] = list(alphas)
+        for m in range(coeffs.shape[0] if metrics else 0):
+            values = get_metrics(Circulant(len(pows), pows, coeffs[m]), vec_b, alphas[m], t)
+            for name, value in values.items():
+                rows[name][m] = value
+    return results
+
+
+# The shared memory blocks and the inner products attached by each worker process of ``cqs_circulant_parallel_main``
+_WORKER = {}
+
+
+def _share_b(U_b):
+    # The arrays of b are placed once in a shared memory block, so that they are not pickled to every worker;
+    # a circuit is small and passed as it is, since its vector is never evaluated by the workers
+    if isinstance(U_b, tuple):
+        indices, values, size = get_sparse_b(U_b)
+        arrays = [indices, values]
+    elif isinstance(U_b, np.ndarray):
+        arrays, size = [np.asarray(U_b)], None
+    else:
+        return None, [], U_b
+    shm = shared_memory.SharedMemory(create=True, size=max(sum(array.nbytes for array in arrays), 1))
+    layout, offset = [], 0
+    for array in arrays:
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf, offset=offset)[:] = array
+        layout.append((array.shape, array.dtype.str, offset))
+        offset += array.nbytes
+    return shm, layout, size
+
+
+def _init_worker(b_name, b_layout, b_info, access, shots, symmetry, term_number):
+    # Attach b in shared memory, read-only; the inner products are attached by each task, see ``_get_worker_ip``
+    shm = None
+    U_b = b_info
+    if b_name is not None:
+        shm = shared_memory.SharedMemory(name=b_name)
+        arrays = [np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset) for shape, dtype, offset in b_layout]
+        for array in arrays:
+            array.flags.writeable = False
+        U_b = (arrays[0], arrays[1], b_info) if len(arrays) == 2 else arrays[0]
+    _WORKER.update(b_shm=shm, b=U_b, access=access, shots=shots, symmetry=symmetry, term_number=term_number,
+                   table=None, table_shm=None, ip=None)
+
+
+def _get_worker_ip(name, threshold):
+    # The table of the inner products is reattached only when the parent process has extended it
+    if _WORKER["table"] != name:
+        if _WORKER["table_shm"] is not None:
+            _WORKER["ip"] = None
+            _WORKER["table_shm"].close()
+        shm = shared_memory.SharedMemory(name=name)
+        term_number = _WORKER["term_number"]
+        records = np.ndarray((len(InnerProduct._RECORDS), 2 * term_number + 2 * threshold), dtype=np.float64,
+                             buffer=shm.buf)
+        records.flags.writeable = False
+        ip = InnerProduct(_WORKER["access"], _WORKER["b"], term_number, threshold, _WORKER["shots"],
+                          symmetry=_WORKER["symmetry"], records=dict(zip(InnerProduct._RECORDS, records)))
+        _WORKER.update(table=name, table_shm=shm, ip=ip)
+    return _WORKER["ip"]
+
+
+def _run_worker(C, T, solver, search, name, threshold, previous, max_T):
+    # The workers never calculate inner products: the table is only extended by the parent process, so that no
+    # power (or job on the hardware) is calculated twice and all matrices use the same estimations
+    ip = _get_worker_ip(name, threshold)
+    if T is not None:
+        return cqs_circulant_main(C, _WORKER["b"], T, ip.access, ip.shots, solver=solver, ip=ip)
+    # Only the thresholds that the Ansatz reaches in this table but not in the previous one are evaluated;
+    # None if the loss does not converge among them
+    solver = "direct" if solver == "incremental" else solver
+    K = np.max(np.abs(C.get_pows()))
+    start = 0 if previous is None else min(previous + ip.term_number - K, max_T) + 1
+    stop = min(threshold + ip.term_number - K, max_T)
+    if stop < start:
+        return None
+
+    def converged(t):
+        W, r = next(sweep_W_r(C, [t], ip, toeplitz=(solver == "toeplitz")))[1:]
+        return solve_combination_parameters(W, r, solver)[0] < 0.01
+
+    if search == "predict":
+        # Bisection as in ``_search_threshold``, which assumes that the loss decreases with the threshold
+        if not converged(stop):
+            return None
+        while start < stop:
+            mid = (start + stop) // 2
+            if converged(mid):
+                stop = mid
+            else:
+                start = mid + 1
+        return int(stop)
+    for t, W, r in sweep_W_r(C, list(range(start, stop + 1)), ip, toeplitz=(solver == "toeplitz")):
+        if solve_combination_parameters(W, r, solver)[0] < 0.01:
+            return t
+    return None
+
+
+def cqs_circulant_parallel_main(Cs: List[Circulant], U_b, access, shots=1024, T: Optional[Union[int, List[int]]] = None,
+                                solver="direct", threshold=20, max_workers=None, cache=None, search="linear"):
+    # The inner products are calculated once up to the threshold (or T) in the parent process and shared with a
+    # single pool of worker processes; for the matrices that did not converge, the table is extended by 20
+    # thresholds ("linear") or doubled from the predicted threshold ("predict"), up to half of the dimension of b,
+    # beyond which the powers wrap around; None for the matrices that do not converge
+    if search not in ["linear", "predict"]:
+        raise NotImplementedError(f"unknown search {search}")
+    dim = get_dimension(U_b)
+    max_T = dim // 2
+    if T is not None:
+        threshold = int(np.max(T))
+    elif search == "predict":
+        guesses = [predict_threshold(C, dim, 0.01) for C in Cs]
+        threshold = min(int(max([1] + [guess for guess in guesses if guess is not None])), max_T)
+    K = max(np.max(np.abs(C.get_pows())) for C in Cs)
+    ip = InnerProduct(access, U_b, K, threshold, shots, cache=cache)
+    results = [None] * len(Cs)
+    pending = list(range(len(Cs)))
+    previous = None
+    b_shm, b_layout, b_info = _share_b(U_b)
+    try:
+        with ProcessPoolExecutor(max_workers, initializer=_init_worker,
+                                 initargs=(None if b_shm is None else b_shm.name, b_layout, b_info, access, shots,
+                                           ip.symmetry, K)) as executor:
+            while True:
+                records = np.stack([getattr(ip, name) for name in InnerProduct._RECORDS])
+                shm = shared_memory.SharedMemory(create=True, size=max(records.nbytes, 1))
+                try:
+                    np.ndarray(records.shape, dtype=np.float64, buffer=shm.buf)[:] = records
+                    # The results are returned in the order of the matrices, whatever the order of completion
+                    count = len(pending)
+                    for i, result in zip(pending, executor.map(_run_worker, [Cs[i] for i in pending], [T] * count,
+                                                               [solver] * count, [search] * count,
+                                                               [shm.name] * count, [ip.threshold] * count,
+                                                               [previous] * count, [max_T] * count)):
+                        results[i] = result
+                finally:
+                    shm.close()
+                    shm.unlink()
+                pending = [i for i in pending if results[i] is None]
+                if T is not None or not pending or ip.threshold >= max_T:
+                    return results
+                previous = ip.threshold
+                ip.extend(min(2 * ip.threshold if search == "predict" else ip.threshold + 20, max_T))
+    finally:
+        if b_shm is not None:
+            b_shm.close()
+            b_shm.unlink()
+
 
+# Test
+if __name__ == "__main__":
+    # The predicted search evaluates O(log T) thresholds and finds the same threshold as the linear search
+    dim = 2 ** 9
+    grid = np.arange(dim)
+    rng = np.random.default_rng(0)
+    vectors = {"random": rng.random(dim) + 1j * rng.random(dim), "gaussian": np.exp(-((grid - dim / 2) / 6) ** 2),
+               "e0": np.eye(dim)[0]}
+    for name, vec_b in vectors.items():
+        vec_b = vec_b / np.linalg.norm(vec_b)
+        for xi in [0.002, 0.01, 0.1, 1]:
+            C = Circulant(3, [0, 1, -1], [-2 - xi, 1, 1])
+            linear = cqs_circulant_cond_main(C, vec_b, "fft")
+            predict = cqs_circulant_cond_main(C, vec_b, "fft", search="predict")
+            print(name, xi, linear, predict, linear == predict)
@@ -19,11 +19,14 @@ setup(
     version=SDK_VERSION,
     install_requires=[
         'numpy',
+        'scipy',
         'qiskit',
         'qiskit-aer',
-        'cvxopt',
         "pylatexenc"
     ],
+    extras_require={
+        'cvxopt': ['cvxopt']
+    },
     python_requires='>=3.8, <=3.11',
     packages=find_packages(),
     license='Apache License 2.0',